@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+from datetime import datetime
+import inspect
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import sys
+import tempfile
+import time
+import timeit
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from lib import serialization
+from lib.commands import RconCommands
+from lib.executors import CoalescingExecutor
+from lib.metrics import MetricsRegistry
+from lib.mock_server import MockHLLServer
+from lib.models import RconRequest, RconResponse
+from lib.pooled_rcon import PooledRcon
+from lib.protocol import HLLRconV2Protocol
+from lib.xor import XorCodec
+
+RESULTS_DIR = Path("data/benchmarks/")
+
+# Results that are worse than the previous run by more than this fraction are
+# reported as regressions
+REGRESSION_THRESHOLD = 0.10
+
+# Keep connection logs from cluttering the output
+logger = logging.getLogger("benchmark")
+logger.setLevel(logging.ERROR)
+
+class Result(NamedTuple):
+    value: float
+    unit: str
+    higher_is_better: bool
+
+BENCHMARKS: dict[str, Callable[[], Result | Awaitable[Result]]] = {}
+
+def benchmark(name: str):
+    def decorator(func: Callable[[], Result | Awaitable[Result]]):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+def per_call_us(func, number: int) -> float:
+    # Best of 5, in microseconds per call
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1_000_000
+
+def get_players_response() -> bytes:
+    from demos.benchmark_json import get_sample_responses
+    return serialization.dumps({
+        "statusCode": 200, "statusMessage": "OK", "version": 2, "name": "ServerInformation",
+        "contentBody": serialization.dumps(get_sample_responses()["players"]).decode(),
+    })
+
+
+@benchmark("xor_codec_32kb")
+def bench_xor() -> Result:
+    codec = XorCodec(os.urandom(32))
+    payload = os.urandom(32 * 1024)
+    return Result(per_call_us(lambda: codec.apply(payload, offset=8), 2000), "us", False)
+
+@benchmark("frame_parsing")
+def bench_parsing() -> Result:
+    from demos.benchmark_parser import CountingProtocol, build_stream, measure
+    stream, num_packets = build_stream(CountingProtocol())
+    protocol = CountingProtocol()
+    elapsed = measure(protocol, stream, 16 * 1024)
+    assert protocol.num_packets == num_packets
+    return Result(len(stream) / 1024 / 1024 / elapsed, "MB/s", True)
+
+def get_authenticated_protocol() -> HLLRconV2Protocol:
+    protocol = HLLRconV2Protocol(loop=None) # type: ignore
+    protocol.xorkey = os.urandom(32)
+    protocol.auth_token = "0123456789abcdef"
+    return protocol
+
+@benchmark("request_packing")
+def bench_packing() -> Result:
+    protocol = get_authenticated_protocol()
+    def pack():
+        request = RconRequest("ServerInformation", 2, protocol.auth_token, {"Name": "players", "Value": ""})
+        return protocol._xor(request.pack())
+    return Result(per_call_us(pack, 20_000), "us", False)
+
+@benchmark("request_packing_cached")
+def bench_packing_cached() -> Result:
+    protocol = get_authenticated_protocol()
+    def pack():
+        request = RconRequest("ServerInformation", 2, protocol.auth_token, {"Name": "players", "Value": ""})
+        return protocol._pack(request)
+    return Result(per_call_us(pack, 20_000), "us", False)
+
+@benchmark("response_decoding_players")
+def bench_decoding() -> Result:
+    body = get_players_response()
+    def decode():
+        response = RconResponse.unpack(1, body)
+        return response.content_dict
+    return Result(per_call_us(decode, 500), "us", False)
+
+@benchmark("response_decoding_players_structs")
+def bench_decoding_structs() -> Result:
+    from lib.structs import PLAYERS_DECODER
+    body = get_players_response()
+    def decode():
+        response = RconResponse.unpack(1, body)
+        return PLAYERS_DECODER.decode(response.content_body)
+    return Result(per_call_us(decode, 500), "us", False)
+
+@benchmark("metrics_recording")
+def bench_metrics() -> Result:
+    # What the protocol records for every request
+    registry = MetricsRegistry()
+    labels = ("127.0.0.1:7779", "ServerInformation")
+    status_labels = (*labels, "ok")
+    def record():
+        registry.observe("rcon_request_latency_seconds", labels, 0.02)
+        registry.inc("rcon_requests_total", status_labels)
+    return Result(per_call_us(record, 200_000), "us", False)
+
+async def bench_pool(pool_size: int, coalesce: bool = False) -> Result:
+    num_requests = 2000
+    async with MockHLLServer(latency=0.005, jitter=0.001, logger=logger) as server:
+        rcon = PooledRcon("127.0.0.1", server.port, server.password, pool_size=pool_size, logger=logger)
+        commands = RconCommands(CoalescingExecutor(rcon)) if coalesce else rcon.commands
+        rcon.start()
+        try:
+            await rcon.wait_until_connected(timeout=10)
+            # Give the other workers a moment to connect as well
+            await asyncio.sleep(0.5)
+
+            start_time = time.perf_counter()
+            await asyncio.gather(*[
+                commands.get_server_session()
+                for _ in range(num_requests)
+            ])
+            elapsed = time.perf_counter() - start_time
+        finally:
+            rcon.stop()
+    return Result(num_requests / elapsed, "req/s", True)
+
+for _pool_size in (1, 5, 10, 20):
+    benchmark(f"pool_throughput_{_pool_size}")(lambda pool_size=_pool_size: bench_pool(pool_size))
+benchmark("pool_throughput_10_coalesced")(lambda: bench_pool(10, coalesce=True))
+
+@benchmark("capture_writes")
+async def bench_capture_writes() -> Result:
+    import demos.capture_position_data as capture
+    from demos.capture_position_data import Match, Row
+
+    num_rows = 100_000
+    rows = [Row(1700000000 + i // 100, 1 + i % 2, i, -i, 100) for i in range(num_rows)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        capture.POSITIONS_DIR = capture.DEATHS_DIR = Path(tmp_dir)
+        match = Match()
+        await match.start("Benchmark")
+        start_time = time.perf_counter()
+        for i in range(0, num_rows, 100):
+            await match.add_positions(rows[i:i+100])
+        elapsed = time.perf_counter() - start_time
+        await match.end()
+    return Result(num_rows / elapsed, "rows/s", True)
+
+@benchmark("heatmap_frame")
+def bench_heatmap() -> Result:
+    import matplotlib
+    matplotlib.use("Agg")
+    import numpy as np
+    from PIL import Image
+    from demos.heatmap_gif import FrameArgs, get_frame
+
+    rng = np.random.default_rng(0)
+    num_rows = 50_000
+    data = np.zeros(num_rows, dtype=[("timestamp", "f8"), ("team_id", "f8"), ("x", "f8"), ("y", "f8"), ("z", "f8")])
+    data["timestamp"] = np.sort(rng.integers(0, 3600, num_rows))
+    data["team_id"] = rng.integers(1, 3, num_rows)
+    data["x"] = rng.uniform(-100000, 100000, num_rows)
+    data["y"] = rng.uniform(-100000, 100000, num_rows)
+    img = Image.new("RGBA", (512, 512), color=(40, 40, 40, 255))
+
+    number = 5
+    start_time = time.perf_counter()
+    for i in range(number):
+        get_frame(FrameArgs(1800 + i * 60, data, img)).close()
+    return Result((time.perf_counter() - start_time) / number * 1000, "ms", False)
+
+
+def find_previous_results() -> Path | None:
+    if not RESULTS_DIR.exists():
+        return None
+    files = sorted(RESULTS_DIR.glob("*.json"))
+    return files[-1] if files else None
+
+def compare(results: dict[str, Any], previous: dict[str, Any]) -> list[str]:
+    regressions = []
+    print(f"{'Benchmark':>28} | {'Previous':>12} | {'Current':>12} | {'Change':>8}")
+    print("-" * 70)
+    for name, result in results.items():
+        old = previous["results"].get(name)
+        if not old or not result.get("value") or not old.get("value"):
+            continue
+
+        change = (result["value"] - old["value"]) / old["value"]
+        worse = -change if result["higher_is_better"] else change
+        flag = ""
+        if worse > REGRESSION_THRESHOLD:
+            flag = " (!)"
+            regressions.append(name)
+        print(f"{name:>28} | {old['value']:>12.2f} | {result['value']:>12.2f} | {change:>+7.1%}{flag}")
+    return regressions
+
+async def main():
+    parser = argparse.ArgumentParser(prog="main.py benchmark", description="Run the benchmark suite")
+    parser.add_argument("names", nargs="*", help="Only run benchmarks whose name starts with any of these")
+    parser.add_argument("--compare", type=Path, help="A results file to compare against. Defaults to the latest run.")
+    parser.add_argument("--no-save", action="store_true", help="Do not store the results")
+    args = parser.parse_args(sys.argv[2:])
+
+    previous_fp: Path | None = args.compare or find_previous_results()
+
+    results: dict[str, Any] = {}
+    print()
+    for name, func in BENCHMARKS.items():
+        if args.names and not any(name.startswith(prefix) for prefix in args.names):
+            continue
+
+        try:
+            result = func()
+            if inspect.isawaitable(result):
+                result = await result
+        except ImportError as e:
+            print(f"{name:>28} | skipped, missing dependency {e.name}")
+            results[name] = {"value": None, "skipped": str(e)}
+            continue
+
+        assert isinstance(result, Result)
+        print(f"{name:>28} | {result.value:>12.2f} {result.unit}")
+        results[name] = result._asdict()
+    print()
+
+    output = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "json_backend": serialization.backend.name,
+        "results": results,
+    }
+
+    if previous_fp:
+        print("Comparing against", previous_fp)
+        previous = json.loads(previous_fp.read_text())
+        regressions = compare(results, previous)
+        print()
+        if regressions:
+            print("Regressions:", ", ".join(regressions))
+            print()
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        fp = RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        fp.write_text(json.dumps(output, indent=2))
+        print("Results saved to", fp)
+        print()
+
+if __name__ == '__main__':
+    asyncio.run(main())
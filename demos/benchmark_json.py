@@ -0,0 +1,78 @@
+import json
+import timeit
+
+from lib.serialization import get_available_backends
+from lib.responses import (
+    AdminLogResponse, GetMapRotationResponse, GetPlayersResponse, GetServerSessionResponse,
+)
+
+def get_sample_responses() -> dict[str, dict]:
+    players: GetPlayersResponse = {"players": [
+        {
+            "name": f"Player {i}", "clanTag": "[CLAN]" if i % 3 else "", "iD": f"{76561198000000000 + i}",
+            "platform": "steam", "eOSId": f"{i:032x}|", "level": 1 + i * 3, # type: ignore
+            "team": i % 2, "role": i % 14, "platoon": "ABLE" if i % 6 else "", # type: ignore
+            "loadout": "Standard Issue", "kills": i % 25, "deaths": i % 17,
+            "scoreData": {"cOMBAT": i * 7, "offense": i * 2, "defense": i * 4, "support": i * 6},
+            "worldPosition": {"x": -45123.4 + i * 811, "y": 38210.9 - i * 523, "z": 1200.5 + i},
+        }
+        for i in range(100)
+    ]}
+    session: GetServerSessionResponse = {
+        "serverName": "Demo Server", "mapName": "Foy", "gameMode": "Warfare", "playerCount": 100,
+        "queueCount": 3, "maxQueueCount": 6, "vIPQueueCount": 0, "maxVIPQueueCount": 2,
+    }
+    maprotation: GetMapRotationResponse = {"mAPS": [
+        {
+            "name": "FOY", "gameMode": "Warfare", "timeOfDay": "Day",
+            "iD": f"/Game/Maps/foy_warfare_{i}", "position": i,
+        }
+        for i in range(30)
+    ]}
+    logs: AdminLogResponse = {"entries": [
+        {
+            "timestamp": "2025.01.01-12.00.00",
+            "message": f"KILL: Player {i}(Allies/{76561198000000000 + i}) -> Player {i + 1}(Axis/{76561198000000001 + i}) with M1 GARAND",
+        }
+        for i in range(1000)
+    ]}
+    return {
+        "players": players, # type: ignore
+        "session": session, # type: ignore
+        "maprotation": maprotation, # type: ignore
+        "adminlog": logs, # type: ignore
+    }
+
+def measure(func, number: int) -> float:
+    # Best of 5, in microseconds per call
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1_000_000
+
+def main():
+    backends = get_available_backends()
+
+    print()
+    print("Available backends:", ", ".join(backend.name for backend in backends))
+    print()
+    print(f"{'Response':>12} | {'Size':>8} | {'Backend':>8} | {'Encode (us)':>12} | {'Decode (us)':>12}")
+    print("-" * 66)
+    for name, content in get_sample_responses().items():
+        # Mimic the server, which encodes the content body as a string inside of the response
+        envelope = json.dumps({
+            "statusCode": 200, "statusMessage": "OK", "version": 2, "name": "ServerInformation",
+            "contentBody": json.dumps(content),
+        }).encode()
+        number = max(10, 2_000_000 // len(envelope))
+
+        for backend in backends:
+            def decode():
+                body = backend.loads(envelope)
+                return backend.loads(body["contentBody"])
+
+            assert decode() == content
+            encode_us = measure(lambda: backend.dumps(content), number)
+            decode_us = measure(decode, number)
+            print(f"{name:>12} | {len(envelope):>8} | {backend.name:>8} | {encode_us:>12.1f} | {decode_us:>12.1f}")
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import json
+import os
+import struct
+import time
+
+from lib.constants import HEADER_FORMAT
+from lib.models import RconResponse
+from lib.protocol import HLLRconV2Protocol
+
+STREAM_SIZE = 8 * 1024 * 1024
+CHUNK_SIZES = (1024, 16 * 1024, 256 * 1024)
+XORKEY = os.urandom(32)
+
+class CountingProtocol(HLLRconV2Protocol):
+    def __init__(self):
+        super().__init__(loop=None) # type: ignore
+        self._seen_v1_xorkey = True
+        self.xorkey = XORKEY
+        self.num_packets = 0
+
+    def _handle_response(self, pkt: RconResponse):
+        self.num_packets += 1
+
+class LegacyProtocol(CountingProtocol):
+    # The bytes-based parser that HLLRconV2Protocol used to have
+    def __init__(self):
+        super().__init__()
+        self._buffer = b"" # type: ignore
+
+    def data_received(self, data: bytes):
+        self.logger.debug("Incoming: (%s) %s", self._xor(data).count(b"\t"), data[:10])
+        self._buffer += data
+        self._read_from_buffer()
+
+    def _read_from_buffer(self):
+        header_len = struct.calcsize(HEADER_FORMAT)
+        if len(self._buffer) < header_len:
+            return
+        pkt_id, pkt_len = struct.unpack(HEADER_FORMAT, self._buffer[:header_len])
+        pkt_size = header_len + pkt_len
+        if len(self._buffer) >= pkt_size:
+            decoded_body = self._xor(self._buffer[header_len:pkt_size])
+            pkt = RconResponse.unpack(pkt_id, decoded_body)
+            self._buffer = self._buffer[pkt_size:]
+            self._handle_response(pkt)
+            if self._buffer:
+                self._read_from_buffer()
+
+def build_packet(pkt_id: int, content_body: dict, protocol: HLLRconV2Protocol) -> bytes:
+    body = json.dumps({
+        "statusCode": 200,
+        "statusMessage": "OK",
+        "version": 2,
+        "name": "ServerInformation",
+        "contentBody": json.dumps(content_body),
+    }).encode()
+    return struct.pack(HEADER_FORMAT, pkt_id, len(body)) + protocol._xor(body)
+
+def build_stream(protocol: HLLRconV2Protocol) -> tuple[bytes, int]:
+    players = {"players": [
+        {
+            "name": f"Player {i}", "clanTag": "", "iD": f"{i:017d}", "platform": "steam",
+            "eOSId": f"{i:032x}", "level": 100, "team": i % 2, "role": i % 14, "platoon": "ABLE",
+            "loadout": "Standard Issue", "kills": 10, "deaths": 5,
+            "scoreData": {"cOMBAT": 100, "offense": 50, "defense": 80, "support": 120},
+            "worldPosition": {"x": 12345.67, "y": -54321.12, "z": 1234.5},
+        }
+        for i in range(100)
+    ]}
+    logs = {"entries": [
+        {"timestamp": "2025.01.01-12.00.00", "message": f"KILL: Player {i}(Allies/{i:017d}) -> Player {i + 1}(Axis/{i + 1:017d}) with M1 GARAND"}
+        for i in range(10_000)
+    ]}
+    session = {
+        "serverName": "Demo Server", "mapName": "Foy", "gameMode": "Warfare", "playerCount": 100,
+        "queueCount": 0, "maxQueueCount": 6, "vIPQueueCount": 0, "maxVIPQueueCount": 2,
+    }
+
+    packets = []
+    size = 0
+    while size < STREAM_SIZE:
+        # Mostly small and medium responses, with the occasional huge log dump
+        if len(packets) % 50 == 0:
+            content_body = logs
+        elif len(packets) % 4 == 0:
+            content_body = players
+        else:
+            content_body = session
+        packet = build_packet(len(packets) + 1, content_body, protocol)
+        packets.append(packet)
+        size += len(packet)
+    return b"".join(packets), len(packets)
+
+def measure(protocol: CountingProtocol, stream: bytes, chunk_size: int) -> float:
+    start_time = time.perf_counter()
+    for i in range(0, len(stream), chunk_size):
+        protocol.data_received(stream[i:i+chunk_size])
+    return time.perf_counter() - start_time
+
+def main():
+    stream, num_packets = build_stream(CountingProtocol())
+
+    print()
+    print(f"Stream of {len(stream) / 1024 / 1024:.1f} MB containing {num_packets} packets")
+    print()
+    print(f"{'Chunk size':>10} | {'Legacy (MB/s)':>14} | {'Current (MB/s)':>14}")
+    print("-" * 46)
+    for chunk_size in CHUNK_SIZES:
+        results = []
+        for protocol in (LegacyProtocol(), CountingProtocol()):
+            elapsed = measure(protocol, stream, chunk_size)
+            assert protocol.num_packets == num_packets
+            results.append(len(stream) / 1024 / 1024 / elapsed)
+        print(f"{chunk_size:>10} | {results[0]:>14.1f} | {results[1]:>14.1f}")
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import gc
+import timeit
+import tracemalloc
+
+from demos.benchmark_json import get_sample_responses
+from lib import serialization
+from lib.structs import (
+    ADMIN_LOG_DECODER, MAP_ROTATION_DECODER, PLAYERS_DECODER, SERVER_SESSION_DECODER, ResponseDecoder,
+)
+
+DECODERS: dict[str, ResponseDecoder] = {
+    "players": PLAYERS_DECODER,
+    "session": SERVER_SESSION_DECODER,
+    "maprotation": MAP_ROTATION_DECODER,
+    "adminlog": ADMIN_LOG_DECODER,
+}
+
+# Number of decoded responses to keep around when measuring memory, like a
+# fleet holding on to the latest response of each server
+NUM_KEPT = 100
+
+def measure(func, number: int) -> float:
+    # Best of 5, in microseconds per call
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1_000_000
+
+def measure_memory(func) -> tuple[float, float]:
+    # Memory still allocated after decoding and at its peak, in KiB per response
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = [func() for _ in range(NUM_KEPT)]
+        size, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size / NUM_KEPT / 1024, peak / NUM_KEPT / 1024
+
+def main():
+    backends = serialization.get_available_backends()
+    active_backend = serialization.backend.name
+
+    print()
+    print(f"{'Response':>12} | {'Backend':>8} | {'Path':>7} | {'Decode (us)':>12} | {'Memory (KiB)':>12} | {'Peak (KiB)':>12}")
+    print("-" * 81)
+    try:
+        for name, content in get_sample_responses().items():
+            decoder = DECODERS[name]
+            for backend in backends:
+                serialization.set_json_backend(backend.name)
+                body = serialization.dumps(content).decode()
+                number = max(10, 1_000_000 // len(body))
+
+                def decode_dict():
+                    return serialization.loads(body)
+
+                def decode_struct():
+                    return decoder.decode(body)
+
+                for path, func in (("dict", decode_dict), ("struct", decode_struct)):
+                    decode_us = measure(func, number)
+                    memory_kib, peak_kib = measure_memory(func)
+                    print(f"{name:>12} | {backend.name:>8} | {path:>7} | {decode_us:>12.1f} | {memory_kib:>12.1f} | {peak_kib:>12.1f}")
+    finally:
+        serialization.set_json_backend(active_backend)
+    print()
+
+if __name__ == '__main__':
+    main()
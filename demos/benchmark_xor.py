@@ -0,0 +1,38 @@
+import array
+import os
+import timeit
+
+from lib.xor import XorCodec
+
+PAYLOAD_SIZES = (256, 4 * 1024, 32 * 1024, 128 * 1024)
+XORKEY = os.urandom(32)
+
+def legacy_xor(message: bytes, xorkey: bytes, offset: int = 0) -> bytes:
+    # The byte-by-byte implementation that HLLRconV2Protocol._xor used to have
+    n = []
+    for i in range(len(message)):
+        n.append(message[i] ^ xorkey[(i + offset) % len(xorkey)])
+    return array.array('B', n).tobytes()
+
+def measure(func, number: int) -> float:
+    # Best of 5, in microseconds per call
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1_000_000
+
+def main():
+    codec = XorCodec(XORKEY)
+
+    print()
+    print(f"{'Payload':>10} | {'Loop (us)':>12} | {'Codec (us)':>12} | {'Speedup':>8}")
+    print("-" * 52)
+    for size in PAYLOAD_SIZES:
+        payload = os.urandom(size)
+        assert codec.apply(payload, offset=3) == legacy_xor(payload, XORKEY, offset=3)
+
+        number = max(1, 200_000 // size)
+        legacy_us = measure(lambda: legacy_xor(payload, XORKEY), number)
+        codec_us = measure(lambda: codec.apply(payload), number * 20)
+        print(f"{size:>10} | {legacy_us:>12.1f} | {codec_us:>12.2f} | {legacy_us / codec_us:>7.0f}x")
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,7 @@ from pathlib import Path
 from typing import NamedTuple
 
 from lib.rcon import Rcon
-from lib.constants import RCON_HOST, RCON_PASSWORD, RCON_PORT
+from lib import constants
 from lib.exceptions import HLLError
 from lib.responses import PlayerTeam
 
@@ -160,9 +160,9 @@ async def main(
     DEATHS_DIR.mkdir(exist_ok=True)
 
     rcon = Rcon(
-        host=host or RCON_HOST,
-        port=port or RCON_PORT,
-        password=password or RCON_PASSWORD,
+        host=host or constants.RCON_HOST,
+        port=port or constants.RCON_PORT,
+        password=password or constants.RCON_PASSWORD,
     )
     rcon.start()
 
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+from collections import Counter
+from contextlib import AsyncExitStack
+import logging
+from pathlib import Path
+import sys
+import time
+
+from lib.fleet import Fleet, FleetServer, ServerConfig, load_fleet_config
+from lib.mock_server import MockHLLServer
+from lib.sharding import PollerSpec, ShardedFleet
+
+REPORT_INTERVAL = 5.0
+
+async def poll_session(server: FleetServer):
+    session = await server.commands.get_server_session()
+    return session["playerCount"]
+
+async def poll_players(server: FleetServer):
+    players = await server.commands.get_players()
+    return len(players["players"])
+
+async def main():
+    parser = argparse.ArgumentParser(prog="main.py fleet", description="Monitor many servers at once")
+    parser.add_argument("config", nargs="?", type=Path, default=Path("fleet.json"), help="A JSON file listing the servers")
+    parser.add_argument("--mock", type=int, metavar="N", help="Start N mock servers to monitor instead")
+    parser.add_argument("--budget", type=float, default=200.0, help="Maximum requests per second across all servers")
+    parser.add_argument("--shards", type=int, metavar="N", help="Spread the servers over N processes")
+    args = parser.parse_args(sys.argv[2:])
+
+    # Connection logs would drown out the reports
+    logger = logging.getLogger("fleet")
+    logger.setLevel(logging.WARNING)
+
+    async with AsyncExitStack() as stack:
+        if args.mock:
+            servers = []
+            for i in range(args.mock):
+                mock = await stack.enter_async_context(MockHLLServer(latency=0.02, logger=logger))
+                servers.append(ServerConfig(f"Mock #{i + 1}", "127.0.0.1", mock.port, mock.password))
+        else:
+            servers = load_fleet_config(args.config)
+
+        fleet: Fleet | ShardedFleet
+        if args.shards:
+            fleet = ShardedFleet(servers, [
+                PollerSpec(poll_session, interval=5),
+                PollerSpec(poll_players, interval=10, cost=4),
+            ], num_shards=args.shards, request_budget=args.budget, logger=logger)
+        else:
+            fleet = Fleet(servers, request_budget=args.budget, logger=logger)
+            fleet.add_poller(poll_session, interval=5)
+            fleet.add_poller(poll_players, interval=10, cost=4)
+        fleet.start()
+
+        try:
+            last_polls = 0
+            last_time = time.monotonic()
+            while True:
+                await asyncio.sleep(REPORT_INTERVAL)
+                health = fleet.get_health()
+                statuses = Counter(server["status"] for server in health.values())
+                polls = sum(server.get("polls", 0) for server in health.values())
+                now = time.monotonic()
+                print(
+                    f"{len(health)} servers | " +
+                    ", ".join(f"{count} {status}" for status, count in sorted(statuses.items())) +
+                    f" | {(polls - last_polls) / (now - last_time):.1f} polls/s"
+                )
+                for name, server in health.items():
+                    if server["status"] != "healthy":
+                        print(f"  {name}: {server['status']} ({server.get('last_error')})")
+                if isinstance(fleet, ShardedFleet):
+                    for shard in fleet.get_shard_stats():
+                        print(f"  Shard {shard['id']}: {shard['servers']} servers, {shard['cpu_usage']:.0%} CPU, {shard['restarts']} restarts")
+                last_polls = polls
+                last_time = now
+        finally:
+            await fleet.stop()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,29 @@
+import asyncio
+import sys
+
+from lib.mock_server import MockHLLServer
+
+
+async def main():
+    # Optionally pass a port and password, e.g. `python main.py mock_server 7779 password`
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 7779
+    password = sys.argv[3] if len(sys.argv) > 3 else "password"
+
+    server = MockHLLServer(
+        host="127.0.0.1",
+        port=port,
+        password=password,
+        player_count=100,
+    )
+
+    async with server:
+        print()
+        print(f"Mock server listening on 127.0.0.1:{server.port} with password \"{password}\"")
+        print("Press Ctrl+C to stop")
+        print()
+        while True:
+            await asyncio.sleep(10)
+            print(f"Connections: {len(server.connections)}, requests handled: {server.stats['requests']}")
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,10 +1,68 @@
 from abc import ABC, abstractmethod
+import asyncio
+from typing import AsyncIterator, Iterable, NamedTuple
+
+# The default number of commands of a batch to execute at the same time
+BATCH_CONCURRENCY = 32
+
+class BatchCommand(NamedTuple):
+    command: str
+    version: int
+    body: str | dict = ""
 
 class RconExecutor(ABC):
     @abstractmethod
     async def execute(self, command: str, version: int, body: str | dict = "") -> str:
         ...
 
+    async def execute_many(
+        self,
+        commands: Iterable[BatchCommand],
+        concurrency: int = BATCH_CONCURRENCY,
+    ) -> list[str | Exception]:
+        """Execute many commands, at most `concurrency` at a time. Returns the
+        responses in the same order as the commands, with the exception in place
+        of the response for each command that failed."""
+        commands = list(commands)
+        results: list[str | Exception] = [None] * len(commands) # type: ignore
+        async for i, result in self.stream_many(commands, concurrency=concurrency):
+            results[i] = result
+        return results
+
+    async def stream_many(
+        self,
+        commands: Iterable[BatchCommand],
+        concurrency: int = BATCH_CONCURRENCY,
+    ) -> AsyncIterator[tuple[int, str | Exception]]:
+        """Execute many commands, at most `concurrency` at a time. Yields the
+        index of each command along with its response or exception, as soon
+        as it completes."""
+        commands = list(commands)
+        pending = iter(enumerate(commands))
+        completed: asyncio.Queue[tuple[int, str | Exception]] = asyncio.Queue()
+
+        async def run():
+            for i, (command, version, body) in pending:
+                try:
+                    result = await self.execute(command, version, body)
+                except Exception as e:
+                    result = e
+                except asyncio.CancelledError as e:
+                    # Only stop when this task is cancelled, and not when the
+                    # command was cancelled by the executor
+                    if asyncio.current_task().cancelling(): # type: ignore
+                        raise
+                    result = e # type: ignore
+                completed.put_nowait((i, result))
+
+        tasks = [asyncio.create_task(run()) for _ in range(min(concurrency, len(commands)))]
+        try:
+            for _ in range(len(commands)):
+                yield await completed.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+
 class RconClient(RconExecutor, ABC):
     @abstractmethod
     def is_started(self) -> bool:
@@ -0,0 +1,175 @@
+from collections import deque
+from enum import Enum
+import logging
+import time
+
+from lib.exceptions import HLLCircuitOpenError
+from lib.metrics import MetricsRegistry, registry as metrics
+
+# Outcomes of requests within this many seconds count towards the failure rate
+WINDOW = 10.0
+# Don't open the circuit before seeing at least this many requests in the window...
+MIN_REQUESTS = 5
+# ...of which at least this fraction failed
+FAILURE_RATE_THRESHOLD = 0.5
+# Also open the circuit after this many failures in a row, no matter how many
+# requests succeeded before them
+CONSECUTIVE_FAILURES = 5
+# How long the circuit stays open before letting a probe through, doubling after
+# every failed probe up to the maximum
+OPEN_DURATION_MIN = 2.0
+OPEN_DURATION_MAX = 30.0
+# Number of probes that may be in flight at once while half-open...
+HALF_OPEN_MAX_PROBES = 1
+# ...and how many of them have to succeed in a row to close the circuit
+HALF_OPEN_SUCCESSES = 2
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Tracks the failure rate of requests to a single server. Once too many of
+    them fail, the circuit opens and requests fail immediately with an
+    `HLLCircuitOpenError`, instead of waiting on a server that is down.
+
+    After a while the circuit becomes half-open, and a limited number of probe
+    requests is let through. If those succeed the circuit closes, otherwise it
+    opens again for longer."""
+
+    def __init__(self, name: str, logger: logging.Logger = logging) -> None: # type: ignore
+        self.name = name
+        self.logger = logger
+        self.state = CircuitState.CLOSED
+        self.open_duration = OPEN_DURATION_MIN
+
+        # (time, failed) of recent requests
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._failures = 0
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+
+    def _prune(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - WINDOW:
+            _, failed = self._outcomes.popleft()
+            if failed:
+                self._failures -= 1
+
+    def get_failure_rate(self) -> float:
+        self._prune(time.monotonic())
+        return self._failures / len(self._outcomes) if self._outcomes else 0.0
+
+    def is_open(self) -> bool:
+        """Whether requests are currently being rejected, without reserving a
+        probe."""
+        if self.state == CircuitState.OPEN:
+            return time.monotonic() - self._opened_at < self.open_duration
+        if self.state == CircuitState.HALF_OPEN:
+            return self._probes >= HALF_OPEN_MAX_PROBES
+        return False
+
+    def check(self) -> None:
+        """Raise an `HLLCircuitOpenError` if requests are being rejected."""
+        if self.is_open():
+            self._reject()
+
+    def before_request(self) -> None:
+        """Raise an `HLLCircuitOpenError` if the request should not be sent.
+        Every call that doesn't raise must be followed by a call to either
+        `record_success` or `record_failure`."""
+        if self.state == CircuitState.CLOSED:
+            return
+
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self._opened_at < self.open_duration:
+                self._reject()
+            self._set_state(CircuitState.HALF_OPEN)
+            self._probes = 0
+            self._probe_successes = 0
+
+        if self._probes >= HALF_OPEN_MAX_PROBES:
+            self._reject()
+        self._probes += 1
+
+    def _reject(self):
+        metrics.inc("rcon_circuit_rejections_total", (self.name,))
+        raise HLLCircuitOpenError("Circuit for %s is open" % self.name)
+
+    def record_success(self) -> None:
+        if self.state == CircuitState.HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+            self._probe_successes += 1
+            if self._probe_successes >= HALF_OPEN_SUCCESSES:
+                self._close()
+            return
+        self._record(False)
+
+    def record_failure(self) -> None:
+        if self.state == CircuitState.HALF_OPEN:
+            # The server still isn't doing well, try again later
+            self.open_duration = min(self.open_duration * 2, OPEN_DURATION_MAX)
+            self._open()
+            return
+        if self.state == CircuitState.CLOSED:
+            self._record(True)
+
+    def record_cancelled(self) -> None:
+        # Neither a success nor a failure, but it should give up its probe
+        if self.state == CircuitState.HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+
+    def _record(self, failed: bool):
+        now = time.monotonic()
+        self._prune(now)
+        self._outcomes.append((now, failed))
+        if not failed:
+            self._consecutive_failures = 0
+            return
+
+        self._failures += 1
+        self._consecutive_failures += 1
+        if self.state == CircuitState.CLOSED and (
+            self._consecutive_failures >= CONSECUTIVE_FAILURES
+            or (
+                len(self._outcomes) >= MIN_REQUESTS
+                and self._failures / len(self._outcomes) >= FAILURE_RATE_THRESHOLD
+            )
+        ):
+            self._open()
+
+    def _open(self):
+        self._set_state(CircuitState.OPEN)
+        self._opened_at = time.monotonic()
+        self._probes = 0
+
+    def _close(self):
+        self._set_state(CircuitState.CLOSED)
+        self.open_duration = OPEN_DURATION_MIN
+        self._outcomes.clear()
+        self._failures = 0
+        self._consecutive_failures = 0
+
+    def _set_state(self, state: CircuitState):
+        if state != self.state:
+            log = self.logger.warning if state == CircuitState.OPEN else self.logger.info
+            log("Circuit for %s is now %s", self.name, state.value)
+            self.state = state
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+def get_circuit_breaker(host: str, port: int) -> CircuitBreaker:
+    """The circuit breaker shared by all connections to a server."""
+    key = f"{host}:{port}"
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = _breakers[key] = CircuitBreaker(key)
+    return breaker
+
+def _collect_metrics(registry: MetricsRegistry):
+    for name, breaker in _breakers.items():
+        registry.set("rcon_circuit_open", (name,), 0 if breaker.state == CircuitState.CLOSED else 1)
+
+metrics.add_collector(_collect_metrics)
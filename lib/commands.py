@@ -1,12 +1,16 @@
 import asyncio
 from functools import wraps
-import json
-from typing import Any, Callable, Coroutine, Mapping, ParamSpec, TypeVar
-from lib.abc import RconExecutor
+from typing import Any, AsyncIterator, Callable, Coroutine, Iterable, Mapping, ParamSpec, TypeVar
+from lib import serialization
+from lib.abc import BATCH_CONCURRENCY, BatchCommand, RconExecutor
 from lib.responses import (
     AdminLogResponse, GetAllCommandsResponse, GetCommandDetailsResponse, GetMapRotationResponse,
     GetPlayerResponse, GetPlayersResponse, GetServerConfigResponse, GetServerSessionResponse,
 )
+from lib.structs import (
+    ADMIN_LOG_DECODER, ALL_COMMANDS_DECODER, COMMAND_DETAILS_DECODER, MAP_ROTATION_DECODER,
+    PLAYER_DECODER, PLAYERS_DECODER, SERVER_CONFIG_DECODER, SERVER_SESSION_DECODER, ResponseDecoder,
+)
 
 P = ParamSpec('P')
 DictT = TypeVar('DictT', bound=Mapping[Any, Any])
@@ -18,14 +22,38 @@ def cast_response_to_dict(dict_type: type[DictT]) -> Callable[
         @wraps(func)
         async def wrapper(*args: P.args, **kwargs: P.kwargs):
             result = await func(*args, **kwargs)
-            return json.loads(result)
+            return serialization.loads(result)
+        return wrapper
+    return decorator
+
+StructT = TypeVar('StructT')
+def cast_response_to_struct(decoder: ResponseDecoder[StructT]) -> Callable[
+    [Callable[P, Coroutine[Any, Any, str]]],
+    Callable[P, Coroutine[Any, Any, StructT]]
+]:
+    def decorator(func: Callable[P, Coroutine[Any, Any, str]]) -> Callable[P, Coroutine[Any, Any, StructT]]:
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs):
+            result = await func(*args, **kwargs)
+            return decoder.decode(result)
         return wrapper
     return decorator
 
+def get_errors(results: list[str | Exception]) -> list[Exception | None]:
+    return [result if isinstance(result, Exception) else None for result in results]
+
 class RconCommands:
     def __init__(self, executor: RconExecutor) -> None:
         self.executor = executor
 
+    async def execute_many(self, commands: Iterable[BatchCommand], concurrency: int = BATCH_CONCURRENCY):
+        return await self.executor.execute_many(commands, concurrency=concurrency)
+
+    def stream_many(
+        self, commands: Iterable[BatchCommand], concurrency: int = BATCH_CONCURRENCY
+    ) -> AsyncIterator[tuple[int, str | Exception]]:
+        return self.executor.stream_many(commands, concurrency=concurrency)
+
     async def add_admin(self, player_id: str, admin_group: str, comment: str):
         await self.executor.execute("AddAdmin", 2, {
             "PlayerId": player_id,
@@ -178,6 +206,15 @@ class RconCommands:
             "PlayerId": player_id,
         })
 
+    async def message_players(self, player_ids: Iterable[str], message: str):
+        return get_errors(await self.executor.execute_many([
+            BatchCommand("SendServerMessage", 2, {
+                "Message": message,
+                "PlayerId": player_id,
+            })
+            for player_id in player_ids
+        ]))
+
     async def kill_player(self, player_id: str, message: str):
         await self.executor.execute("PunishPlayer", 2, {
             "PlayerId": player_id,
@@ -190,6 +227,15 @@ class RconCommands:
             "Reason": message,
         })
 
+    async def kick_players(self, player_ids: Iterable[str], message: str):
+        return get_errors(await self.executor.execute_many([
+            BatchCommand("Kick", 2, {
+                "PlayerId": player_id,
+                "Reason": message,
+            })
+            for player_id in player_ids
+        ]))
+
     async def ban_player(self, player_id: str, reason: str, admin_name: str, duration_hours: int | None = None):
         if duration_hours:
             await self.executor.execute("TemporaryBan", 2, {
@@ -243,3 +289,67 @@ class RconCommands:
         await self.executor.execute("SetVoteToKickThreshold", 2, {
             "ThresholdValue": ",".join([f"{p},{v}" for p, v in thresholds]),
         })
+
+class TypedRconCommands:
+    """The read-only commands of `RconCommands`, returning the compact objects
+    from `lib/structs.py` instead of dicts."""
+
+    def __init__(self, executor: RconExecutor) -> None:
+        self.executor = executor
+
+    @cast_response_to_struct(ADMIN_LOG_DECODER)
+    async def admin_log(self, seconds_span: int, filter: str | None = None):
+        return await self.executor.execute("AdminLog", 2, {
+            "LogBackTrackTime": seconds_span,
+            "Filters": filter or "",
+        })
+
+    @cast_response_to_struct(ALL_COMMANDS_DECODER)
+    async def get_all_commands(self):
+        return await self.executor.execute("DisplayableCommands", 2)
+
+    @cast_response_to_struct(PLAYER_DECODER)
+    async def get_player(self, player_id: str):
+        return await self.executor.execute("ServerInformation", 2, {
+            "Name": "player",
+            "Value": player_id
+        })
+
+    @cast_response_to_struct(PLAYERS_DECODER)
+    async def get_players(self):
+        return await self.executor.execute("ServerInformation", 2, {
+            "Name": "players",
+            "Value": ""
+        })
+
+    @cast_response_to_struct(MAP_ROTATION_DECODER)
+    async def get_map_rotation(self):
+        return await self.executor.execute("ServerInformation", 2, {
+            "Name": "maprotation",
+            "Value": ""
+        })
+
+    @cast_response_to_struct(MAP_ROTATION_DECODER)
+    async def get_map_sequence(self):
+        return await self.executor.execute("ServerInformation", 2, {
+            "Name": "mapsequence",
+            "Value": ""
+        })
+
+    @cast_response_to_struct(SERVER_SESSION_DECODER)
+    async def get_server_session(self):
+        return await self.executor.execute("ServerInformation", 2, {
+            "Name": "session",
+            "Value": ""
+        })
+
+    @cast_response_to_struct(SERVER_CONFIG_DECODER)
+    async def get_server_config(self):
+        return await self.executor.execute("ServerInformation", 2, {
+            "Name": "serverconfig",
+            "Value": ""
+        })
+
+    @cast_response_to_struct(COMMAND_DETAILS_DECODER)
+    async def get_command_details(self, command: str):
+        return await self.executor.execute("ClientReferenceData", 2, command)
@@ -7,20 +7,55 @@ ENV_PATH = Path(".env")
 if ENV_PATH.exists():
     load_dotenv(ENV_PATH)
 
-RCON_HOST: Final[str] = os.getenv("RCON_HOST", "")
-RCON_PORT: Final[int] = int(os.getenv("RCON_PORT", 0))
-RCON_PASSWORD: Final[str] = os.getenv("RCON_PASSWORD", "")
+RCON_HOST: Final[str]
+RCON_PORT: Final[int]
+RCON_PASSWORD: Final[str]
 
-if not RCON_HOST:
-    raise Exception("Missing RCON_HOST environment variable")
-if not RCON_PORT:
-    raise Exception("Missing RCON_PORT environment variable")
-if not RCON_PASSWORD:
-    raise Exception("Missing RCON_PASSWORD environment variable")
+def __getattr__(name: str):
+    # The connection details are only required once something asks for them, so
+    # that the library can be used without them, e.g. against a mock server
+    if name == "RCON_HOST":
+        if not (value := os.getenv("RCON_HOST", "")):
+            raise Exception("Missing RCON_HOST environment variable")
+        return value
+    if name == "RCON_PORT":
+        if not (value := int(os.getenv("RCON_PORT", 0))):
+            raise Exception("Missing RCON_PORT environment variable")
+        return value
+    if name == "RCON_PASSWORD":
+        if not (value := os.getenv("RCON_PASSWORD", "")):
+            raise Exception("Missing RCON_PASSWORD environment variable")
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 DO_XOR_RESPONSES: Final[bool] = False
 DO_USE_REQUEST_HEADERS: Final[bool] = False
 DO_POP_V1_XORKEY: Final[bool] = True
 
 HEADER_FORMAT = "<II"
-DO_WAIT_BETWEEN_REQUESTS: float = 0.0
+
+# The maximum number of requests per second to send to a server, shared by all
+# connections to it. Set to 0 to disable. Individual servers can be configured
+# with `lib.ratelimit.set_rate_limit`.
+DEFAULT_RATE_LIMIT: float = 0.0
+
+# Without request headers, responses are matched to requests in order. Requests
+# that were cancelled keep their place until their response arrives, and once
+# more than this many responses are outstanding for them the connection is
+# dropped instead.
+FIFO_MAX_ABANDONED: int = 64
+
+# Requests issued within the same event loop iteration are written to the socket
+# together, in batches of at most this many requests
+WRITE_BATCH_MAX_SIZE: int = 64
+# How long to hold on to a batch for more requests before writing it
+WRITE_BATCH_MAX_DELAY: float = 0.0
+
+# The maximum number of pre-serialized requests to keep per connection
+REQUEST_TEMPLATE_CACHE_SIZE: int = 128
+
+# TCP keepalive, so that the OS notices dead connections even when idle. The
+# connection is dropped after the configured number of unanswered probes.
+TCP_KEEPALIVE_IDLE: int = 30
+TCP_KEEPALIVE_INTERVAL: int = 10
+TCP_KEEPALIVE_COUNT: int = 3
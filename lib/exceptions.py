@@ -21,3 +21,9 @@ class HLLAuthError(HLLConnectionError):
 class HLLConnectionLostError(HLLConnectionError):
     pass
 
+
+class HLLCircuitOpenError(HLLConnectionError):
+    """Raised instead of sending a request to a server that is failing."""
+
+class HLLQueueFullError(HLLError):
+    """Raised when a request is shed because too many requests are queued."""
@@ -0,0 +1,157 @@
+import asyncio
+from collections import Counter, OrderedDict
+import time
+from typing import Iterable, Mapping
+
+from lib import serialization
+from lib.abc import RconExecutor
+from lib.utils import get_command_name
+
+# Commands that only read state, so concurrent identical requests can safely
+# share a single response
+COALESCED_COMMANDS = frozenset({
+    "ServerInformation",
+    "AdminLog",
+    "DisplayableCommands",
+    "ClientReferenceData",
+})
+
+# How many seconds responses stay cached, keyed by the command or, for
+# ServerInformation, the type of information
+CACHE_TTLS: dict[str, float] = {
+    "maprotation": 60.0,
+    "mapsequence": 60.0,
+    "serverconfig": 300.0,
+    "session": 2.0,
+    "DisplayableCommands": 300.0,
+    "ClientReferenceData": 300.0,
+}
+
+# Cached responses that are no longer accurate once a command is executed
+CACHE_INVALIDATIONS: dict[str, frozenset[str]] = {
+    "AddMapToRotation": frozenset({"maprotation"}),
+    "RemoveMapFromRotation": frozenset({"maprotation"}),
+    "AddMapToSequence": frozenset({"mapsequence"}),
+    "RemoveMapFromSequence": frozenset({"mapsequence"}),
+    "MoveMapFromSequence": frozenset({"mapsequence"}),
+    "ShuffleMapSequence": frozenset({"mapsequence"}),
+    "ChangeMap": frozenset({"session"}),
+}
+
+def get_request_key(command: str, version: int, body: str | dict) -> tuple[str, int, str | bytes]:
+    return (command, version, body if isinstance(body, str) else serialization.dumps(body))
+
+class CoalescingExecutor(RconExecutor):
+    """Wraps another executor. When a read-only command is executed while an
+    identical one is still waiting for its response, it waits for that same
+    response rather than sending the command again.
+
+    ```py
+    commands = RconCommands(CoalescingExecutor(rcon))
+    ```
+    """
+
+    def __init__(self, executor: RconExecutor, commands: Iterable[str] = COALESCED_COMMANDS) -> None:
+        self.executor = executor
+        self.commands = frozenset(commands)
+        # Number of requests sent and coalesced, both in total and per command
+        self.stats: Counter[str] = Counter()
+        self._pending: dict[tuple, asyncio.Future[str]] = {}
+
+    async def execute(self, command: str, version: int, body: str | dict = "") -> str:
+        if command not in self.commands:
+            return await self.executor.execute(command, version, body)
+
+        key = get_request_key(command, version, body)
+        future = self._pending.get(key)
+        if future:
+            self.stats["coalesced"] += 1
+            self.stats["coalesced:" + command] += 1
+        else:
+            self.stats["sent"] += 1
+            self.stats["sent:" + command] += 1
+            future = asyncio.ensure_future(self.executor.execute(command, version, body))
+            self._pending[key] = future
+            future.add_done_callback(lambda f: self._on_done(key, f))
+
+        # Don't let one caller cancelling take the response away from the others
+        return await asyncio.shield(future)
+
+    def _on_done(self, key: tuple, future: asyncio.Future[str]):
+        if self._pending.get(key) is future:
+            del self._pending[key]
+        # Avoid warnings in case every caller was cancelled
+        if not future.cancelled():
+            future.exception()
+
+class CachingExecutor(RconExecutor):
+    """Wraps another executor. Responses to commands that have a TTL are
+    cached for that long, and dropped early when a command that changes them
+    is executed through this same executor.
+
+    ```py
+    commands = RconCommands(CachingExecutor(rcon, ttls={**CACHE_TTLS, "players": 1.0}))
+    ```
+    """
+
+    def __init__(
+        self,
+        executor: RconExecutor,
+        ttls: Mapping[str, float] = CACHE_TTLS,
+        invalidations: Mapping[str, Iterable[str]] = CACHE_INVALIDATIONS,
+        max_size: int = 256,
+    ) -> None:
+        self.executor = executor
+        self.ttls = dict(ttls)
+        self.invalidations = {command: frozenset(names) for command, names in invalidations.items()}
+        self.max_size = max_size
+        # Number of hits and misses, both in total and per cached name
+        self.stats: Counter[str] = Counter()
+        self._cache: OrderedDict[tuple, tuple[float, str, str]] = OrderedDict()
+        # Incremented on every invalidation, so that responses that were requested
+        # before an invalidation don't get cached after it
+        self._generations: Counter[str] = Counter()
+
+    async def execute(self, command: str, version: int, body: str | dict = "") -> str:
+        name = get_command_name(command, body)
+        ttl = self.ttls.get(name)
+        if not ttl:
+            try:
+                return await self.executor.execute(command, version, body)
+            finally:
+                if command in self.invalidations:
+                    self.invalidate(*self.invalidations[command])
+
+        key = get_request_key(command, version, body)
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached and cached[0] > now:
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            self.stats["hits:" + name] += 1
+            return cached[2]
+
+        self.stats["misses"] += 1
+        self.stats["misses:" + name] += 1
+        generation = self._generations[name]
+        response = await self.executor.execute(command, version, body)
+
+        if self._generations[name] == generation:
+            self._cache[key] = (now + ttl, name, response)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+                self.stats["evictions"] += 1
+        return response
+
+    def invalidate(self, *names: str) -> None:
+        """Drop the cached responses of the given commands or types of
+        information. Drops everything if none are given."""
+        if not names:
+            names = tuple(self._generations) + tuple(self.ttls)
+        for name in names:
+            self._generations[name] += 1
+        self._cache = OrderedDict(
+            (key, value) for key, value in self._cache.items()
+            if value[1] not in names
+        )
@@ -0,0 +1,293 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+from pathlib import Path
+import time
+from typing import Any, Awaitable, Callable, Iterable, NamedTuple
+
+from lib.rcon import Rcon
+from lib.ratelimit import TokenBucket
+
+# Consider a server unhealthy after this many polls in a row failed
+UNHEALTHY_AFTER_FAILURES = 3
+# Weight of the latest poll duration in a server's average
+POLL_DURATION_EWMA_ALPHA = 0.2
+
+class ServerConfig(NamedTuple):
+    name: str
+    host: str
+    port: int
+    password: str
+
+def load_fleet_config(path: str | Path) -> list[ServerConfig]:
+    """Read a list of servers from a JSON file in the following format:
+
+    ```json
+    {"servers": [{"name": "EU #1", "host": "127.0.0.1", "port": 7779, "password": "password"}]}
+    ```
+    """
+    data = json.loads(Path(path).read_text())
+    servers = [
+        ServerConfig(
+            name=server.get("name") or f"{server['host']}:{server['port']}",
+            host=server["host"],
+            port=int(server["port"]),
+            password=server["password"],
+        )
+        for server in data["servers"]
+    ]
+    names = [server.name for server in servers]
+    if len(set(names)) != len(names):
+        raise ValueError("Server names must be unique")
+    return servers
+
+class Poller(NamedTuple):
+    name: str
+    func: Callable[['FleetServer'], Awaitable[Any]]
+    interval: float
+    # Number of requests a single poll makes, taken from the fleet's budget
+    cost: float
+
+class FleetServer:
+    def __init__(self, config: ServerConfig, rcon: Rcon) -> None:
+        self.config = config
+        self.rcon = rcon
+        self.commands = rcon.commands
+        # Held while polling, so that polls of different pollers don't overlap
+        self.poll_lock = asyncio.Lock()
+
+        self.polls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_success: float | None = None
+        self.last_error: str | None = None
+        self.poll_duration: float | None = None
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    def is_healthy(self) -> bool:
+        return self.rcon.is_connected() and self.consecutive_failures < UNHEALTHY_AFTER_FAILURES
+
+    def record_success(self, duration: float):
+        self.polls += 1
+        self.consecutive_failures = 0
+        self.last_success = time.monotonic()
+        if self.poll_duration is None:
+            self.poll_duration = duration
+        else:
+            self.poll_duration += POLL_DURATION_EWMA_ALPHA * (duration - self.poll_duration)
+
+    def record_failure(self, error: BaseException):
+        self.polls += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+    def get_health(self) -> dict:
+        if not self.rcon.is_connected():
+            status = "disconnected"
+        elif self.consecutive_failures >= UNHEALTHY_AFTER_FAILURES:
+            status = "failing"
+        else:
+            status = "healthy"
+
+        return {
+            "status": status,
+            "polls": self.polls,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "seconds_since_success": None if self.last_success is None else time.monotonic() - self.last_success,
+            "poll_duration": self.poll_duration,
+            "last_error": self.last_error,
+        }
+
+class Fleet:
+    """Manages connections to many servers on a single event loop, and polls
+    them within a shared budget of requests per second.
+
+    ```py
+    fleet = Fleet(load_fleet_config("fleet.json"), request_budget=500)
+    fleet.add_poller(poll_players, interval=5, cost=1)
+    fleet.start()
+    ...
+    await fleet.stop()
+    ```
+    """
+
+    def __init__(
+        self,
+        servers: Iterable[ServerConfig],
+        request_budget: float = 200.0,
+        max_concurrent_handshakes: int = 10,
+        handshake_stagger: float = 0.05,
+        logger: logging.Logger = logging # type: ignore
+    ) -> None:
+        self.request_budget = request_budget
+        self.handshake_stagger = handshake_stagger
+        self.logger = logger
+
+        # Prevents connecting to all servers at the exact same time
+        self._handshakes = asyncio.Semaphore(max_concurrent_handshakes)
+        self._budget = TokenBucket(request_budget, burst=max(request_budget / 10, 1.0))
+
+        self.servers: dict[str, FleetServer] = {}
+        for config in servers:
+            self._add_server(config)
+
+        self._pollers: list[Poller] = []
+        self._tasks: set[asyncio.Task] = set()
+        self._scheduler_task: asyncio.Task | None = None
+        self._schedule_changed = asyncio.Event()
+        # Polls that are due at a certain time, in terms of time.monotonic()
+        self._schedule: list[tuple[float, int, str, Poller]] = []
+        self._counter = itertools.count()
+
+    def add_poller(
+        self,
+        func: Callable[[FleetServer], Awaitable[Any]],
+        interval: float,
+        cost: float = 1.0,
+        name: str | None = None,
+    ) -> None:
+        """Call `func` for each server every `interval` seconds. If the budget
+        does not allow for that, every server is polled less often equally."""
+        poller = Poller(name or func.__name__, func, interval, cost)
+        self._pollers.append(poller)
+        if self.is_started():
+            self._schedule_poller(poller)
+
+    def is_started(self) -> bool:
+        return self._scheduler_task is not None
+
+    def start(self) -> None:
+        if self.is_started():
+            raise RuntimeError("Fleet is already started")
+
+        # Spread out connection attempts, and polls along with them
+        for i, server in enumerate(self.servers.values()):
+            self._spawn(self._start_server(server, delay=i * self.handshake_stagger))
+
+        for poller in self._pollers:
+            self._schedule_poller(poller)
+        self._scheduler_task = asyncio.create_task(self._scheduler_loop())
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks)
+        if self._scheduler_task:
+            tasks.append(self._scheduler_task)
+            self._scheduler_task = None
+        for task in tasks:
+            task.cancel()
+        for server in self.servers.values():
+            server.rcon.stop()
+        self._schedule.clear()
+
+        # Wait for polls in progress to finish cancelling
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def add_server(self, config: ServerConfig) -> FleetServer:
+        server = self._add_server(config)
+        if self.is_started():
+            server.rcon.start()
+            now = time.monotonic()
+            for poller in self._pollers:
+                self._push(now, server.name, poller)
+        return server
+
+    def _add_server(self, config: ServerConfig) -> FleetServer:
+        if config.name in self.servers:
+            raise ValueError("Duplicate server name %r" % config.name)
+        rcon = Rcon(
+            host=config.host,
+            port=config.port,
+            password=config.password,
+            handshake_semaphore=self._handshakes,
+            logger=self.logger,
+        )
+        server = self.servers[config.name] = FleetServer(config, rcon)
+        return server
+
+    def remove_server(self, name: str) -> None:
+        server = self.servers.pop(name)
+        server.rcon.stop()
+        # Polls of this server that are still scheduled are skipped once due
+
+    def set_request_budget(self, request_budget: float) -> None:
+        self.request_budget = request_budget
+        self._budget.rate = request_budget
+        self._budget.burst = max(request_budget / 10, 1.0)
+
+    def get_health(self) -> dict[str, dict]:
+        return {name: server.get_health() for name, server in self.servers.items()}
+
+    def _spawn(self, coro: Awaitable[Any]):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _start_server(self, server: FleetServer, delay: float):
+        await asyncio.sleep(delay)
+        server.rcon.start()
+
+    def _schedule_poller(self, poller: Poller):
+        # Stagger the first poll of each server over the interval
+        now = time.monotonic()
+        num_servers = max(len(self.servers), 1)
+        for i, name in enumerate(self.servers):
+            self._push(now + poller.interval * i / num_servers, name, poller)
+
+    def _push(self, due: float, name: str, poller: Poller):
+        heapq.heappush(self._schedule, (due, next(self._counter), name, poller))
+        self._schedule_changed.set()
+
+    async def _scheduler_loop(self):
+        while True:
+            self._schedule_changed.clear()
+            if not self._schedule:
+                await self._schedule_changed.wait()
+                continue
+
+            due = self._schedule[0][0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._schedule_changed.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due, _, name, poller = heapq.heappop(self._schedule)
+            server = self.servers.get(name)
+            if server is None:
+                # The server was removed
+                continue
+            if not server.rcon.is_connected():
+                # Don't spend budget on servers we can't reach
+                self._push(time.monotonic() + poller.interval, name, poller)
+                continue
+
+            await self._budget.acquire(poller.cost)
+            self._spawn(self._poll(server, poller, due))
+
+    async def _poll(self, server: FleetServer, poller: Poller, due: float):
+        async with server.poll_lock:
+            started_at = time.monotonic()
+            try:
+                await poller.func(server)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                server.record_failure(e)
+                self.logger.debug("Poll %s of server %s failed: %r", poller.name, server.name, e)
+            else:
+                server.record_success(time.monotonic() - started_at)
+
+        if self.servers.get(server.name) is not server:
+            return
+        # Schedule the next poll only now, so that polls of the same poller don't
+        # pile up. Don't try to catch up on polls that were delayed.
+        self._push(max(due + poller.interval, time.monotonic()), server.name, poller)
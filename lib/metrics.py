@@ -0,0 +1,179 @@
+import asyncio
+from bisect import bisect_left
+import logging
+from typing import Callable, Literal
+
+MetricType = Literal["counter", "gauge", "histogram"]
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Name: (type, label names, description)
+METRICS: dict[str, tuple[MetricType, tuple[str, ...], str]] = {
+    "rcon_requests_total": ("counter", ("server", "command", "status"), "Requests executed, by outcome"),
+    "rcon_request_latency_seconds": ("histogram", ("server", "command"), "Time from sending a request until its response"),
+    "rcon_connects_total": ("counter", ("server",), "Connections established"),
+    "rcon_connection_losses_total": ("counter", ("server",), "Connections lost while in use"),
+    "rcon_keepalive_failures_total": ("counter", ("server",), "Keepalive probes that went unanswered"),
+    "rcon_standby_failovers_total": ("counter", ("server",), "Lost connections replaced by a standby connection"),
+    "rcon_circuit_open": ("gauge", ("server",), "Whether requests to a server are being rejected"),
+    "rcon_circuit_rejections_total": ("counter", ("server",), "Requests rejected because the circuit was open"),
+    "rcon_pool_queue_depth": ("gauge", ("server",), "Commands waiting in the pool queue"),
+    "rcon_pool_queue_wait_seconds": ("histogram", ("server",), "Time commands spent in the pool queue"),
+    "rcon_pool_retries_total": ("counter", ("server", "command", "reason"), "Commands queued again after failing"),
+    "rcon_pool_hedges_total": ("counter", ("server", "command"), "Duplicate requests sent because the first was slow"),
+    "rcon_pool_hedge_wins_total": ("counter", ("server", "command"), "Duplicate requests that answered first"),
+    "rcon_pool_shed_total": ("counter", ("server",), "Commands shed because the pool queue was full"),
+    "rcon_pool_dropped_total": ("counter", ("server", "reason"), "Commands dropped from the queue without being sent"),
+    "rcon_pool_workers": ("gauge", ("server",), "Workers in the pool"),
+    "rcon_pool_worker_in_flight": ("gauge", ("server", "worker"), "Commands in flight per worker"),
+    "rcon_pool_worker_latency_seconds": ("gauge", ("server", "worker"), "Average response latency per worker"),
+    "rcon_pool_worker_busy_seconds_total": ("counter", ("server", "worker"), "Time each worker spent executing commands"),
+}
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        # The last count is for values above the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+class MetricsRegistry:
+    """Keeps counters, gauges and histograms in memory, per combination of label
+    values. Labels are passed as a tuple, in the order of the label names in
+    `METRICS`.
+
+    Gauges are not updated as things happen, but by collectors, which are called
+    whenever a snapshot is taken."""
+
+    def __init__(self, metrics: dict[str, tuple[MetricType, tuple[str, ...], str]] = METRICS) -> None:
+        self.metrics = dict(metrics)
+        self._values: dict[str, dict[tuple, float | Histogram]] = {name: {} for name in self.metrics}
+        self._collectors: list[Callable[['MetricsRegistry'], None]] = []
+
+    def inc(self, name: str, labels: tuple, value: float = 1.0) -> None:
+        values = self._values[name]
+        values[labels] = values.get(labels, 0.0) + value # type: ignore
+
+    def set(self, name: str, labels: tuple, value: float) -> None:
+        self._values[name][labels] = value
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        values = self._values[name]
+        histogram = values.get(labels)
+        if histogram is None:
+            histogram = values[labels] = Histogram()
+        histogram.observe(value) # type: ignore
+
+    def add_collector(self, collector: Callable[['MetricsRegistry'], None]) -> None:
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[['MetricsRegistry'], None]) -> None:
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def clear(self) -> None:
+        for values in self._values.values():
+            values.clear()
+
+    def _collect(self):
+        for name, (type_, _, _) in self.metrics.items():
+            if type_ == "gauge":
+                self._values[name].clear()
+        for collector in list(self._collectors):
+            try:
+                collector(self)
+            except Exception:
+                logging.exception("Failed to collect metrics")
+
+    def snapshot(self) -> dict[str, list[dict]]:
+        """The current value of every metric, for each combination of labels."""
+        self._collect()
+        snapshot = {}
+        for name, (_, label_names, _) in self.metrics.items():
+            snapshot[name] = [
+                {
+                    "labels": dict(zip(label_names, labels)),
+                    **(value.to_dict() if isinstance(value, Histogram) else {"value": value}),
+                }
+                for labels, value in self._values[name].items()
+            ]
+        return snapshot
+
+    def expose(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        self._collect()
+        lines = []
+        for name, (type_, label_names, description) in self.metrics.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {type_}")
+            for labels, value in self._values[name].items():
+                label_str = ",".join(
+                    '%s="%s"' % (label_name, str(label).replace("\\", "\\\\").replace('"', '\\"'))
+                    for label_name, label in zip(label_names, labels)
+                )
+                if isinstance(value, Histogram):
+                    for bound, count in value.to_dict()["buckets"].items():
+                        le = "+Inf" if bound == "inf" else bound
+                        lines.append(f'{name}_bucket{{{label_str}{"," if label_str else ""}le="{le}"}} {count}')
+                    lines.append(f"{name}_sum{{{label_str}}} {value.sum}")
+                    lines.append(f"{name}_count{{{label_str}}} {value.count}")
+                else:
+                    lines.append(f"{name}{{{label_str}}} {value}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+async def start_metrics_server(
+    host: str = "127.0.0.1",
+    port: int = 9100,
+    registry: MetricsRegistry = registry,
+    logger: logging.Logger = logging, # type: ignore
+) -> asyncio.Server:
+    """Serve the metrics over HTTP at `/metrics`, for Prometheus to scrape."""
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            # Skip the headers
+            while (await reader.readline()).strip():
+                pass
+
+            parts = request_line.decode(errors="replace").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status = "200 OK"
+                body = registry.expose().encode()
+            else:
+                status = "404 Not Found"
+                body = b"Not Found\n"
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        except Exception:
+            logger.exception("Failed to serve metrics")
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host=host, port=port)
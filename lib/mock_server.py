@@ -0,0 +1,536 @@
+import asyncio
+import base64
+from collections import Counter, deque
+from datetime import datetime
+import json
+import logging
+import os
+import random
+import secrets
+import struct
+import time
+from typing import Any
+
+from lib import serialization
+from lib.constants import DO_POP_V1_XORKEY, DO_USE_REQUEST_HEADERS, HEADER_FORMAT
+from lib.models import RconResponseStatus
+from lib.responses import (
+    AdminLogResponseEntry, GetAllCommandsResponseEntry, GetMapRotationResponseEntry, GetPlayerResponse,
+    PlayerRole, PlayerTeam,
+)
+from lib.xor import XorCodec
+
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+MAPS = (
+    ("FOY", "foy"), ("CARENTAN", "carentan"), ("HILL 400", "hill400"), ("HURTGEN FOREST", "hurtgenforest"),
+    ("KURSK", "kursk"), ("OMAHA BEACH", "omahabeach"), ("PURPLE HEART LANE", "phl"),
+    ("SAINTE-MARIE-DU-MONT", "stmariedumont"), ("STALINGRAD", "stalingrad"), ("TOBRUK", "tobruk"),
+    ("UTAH BEACH", "utahbeach"), ("EL ALAMEIN", "elalamein"),
+)
+WEAPONS = ("M1 GARAND", "KARABINER 98K", "THOMPSON", "MP40", "M1919 BROWNING", "MG42", "BAZOOKA", "PANZERSCHRECK")
+LOADOUTS = ("Standard Issue", "Veteran", "Ranger", "Assault", "Paratrooper")
+
+# Commands that are accepted but don't change anything about the mock game
+NOOP_COMMANDS = frozenset({
+    "AddAdmin", "ChangeSectorLayout", "ShuffleMapSequence", "SetTeamSwitchCooldown", "SetMaxQueuedPlayers",
+    "SetIdleKickDuration", "SendServerMessage", "ServerBroadcast", "SetHighPingThreshold", "RemoveTempBan",
+    "RemovePermanentBan", "SetAutoBalance", "AutoBalanceThreshold", "EnableVoteToKick",
+    "ResetVoteToKickThreshold", "SetVoteToKickThreshold",
+})
+
+class MockGameState:
+    """A fake game in progress, with players that move around and kill each other."""
+
+    def __init__(self, player_count: int = 100, seed: int | None = None) -> None:
+        self.rng = random.Random(seed)
+        self.server_name = "Mock HLL Server"
+        self.start_time = time.time()
+        self._last_tick = self.start_time
+        self._pending_kills = 0.0
+        self._player_uid = 0
+
+        self.map_rotation: list[GetMapRotationResponseEntry] = [
+            {
+                "name": name,
+                "gameMode": "Warfare",
+                "timeOfDay": "Day",
+                "iD": f"/Game/Maps/{map_id}_warfare",
+                "position": i,
+            }
+            for i, (name, map_id) in enumerate(MAPS)
+        ]
+        self.map_sequence = list(self.map_rotation)
+        self.map_name = self.map_rotation[0]["name"]
+
+        self.admin_log: deque[tuple[float, str]] = deque(maxlen=20_000)
+        self.players: list[GetPlayerResponse] = []
+        for _ in range(player_count):
+            self.add_player()
+
+        self.log(f"MATCH START {self.map_name} Warfare")
+
+    def log(self, message: str) -> None:
+        now = time.time()
+        uptime = int(now - self.start_time)
+        self.admin_log.append((now, f"[{uptime // 3600}:{uptime // 60 % 60:02d}:{uptime % 60:02d} hours ({int(now)})] {message}"))
+
+    def add_player(self) -> GetPlayerResponse:
+        self._player_uid += 1
+        team = PlayerTeam.US if self._player_uid % 2 else PlayerTeam.GER
+        player: GetPlayerResponse = {
+            "name": f"Player {self._player_uid}",
+            "clanTag": self.rng.choice(("", "", "[ABC]", "[7DR]")),
+            "iD": str(76561198000000000 + self._player_uid),
+            "platform": "steam", # type: ignore
+            "eOSId": secrets.token_hex(16) + "|",
+            "level": self.rng.randint(1, 500),
+            "team": team,
+            "role": self.rng.choice(list(PlayerRole)),
+            "platoon": self.rng.choice(("", "ABLE", "BAKER", "CHARLIE", "DOG")),
+            "loadout": self.rng.choice(LOADOUTS),
+            "kills": 0,
+            "deaths": 0,
+            "scoreData": {"cOMBAT": 0, "offense": 0, "defense": 0, "support": 0},
+            "worldPosition": self._random_position(),
+        }
+        self.players.append(player)
+        return player
+
+    def remove_player(self, player_id: str) -> GetPlayerResponse | None:
+        player = self.get_player(player_id)
+        if player:
+            self.players.remove(player)
+        return player
+
+    def get_player(self, player_id: str) -> GetPlayerResponse | None:
+        for player in self.players:
+            if player["iD"] == player_id:
+                return player
+        return None
+
+    def _random_position(self):
+        return {
+            "x": round(self.rng.uniform(-90000, 90000), 2),
+            "y": round(self.rng.uniform(-90000, 90000), 2),
+            "z": round(self.rng.uniform(0, 3000), 2),
+        }
+
+    def tick(self) -> None:
+        """Advance the game to the current time."""
+        now = time.time()
+        elapsed = min(now - self._last_tick, 10.0)
+        self._last_tick = now
+        if elapsed <= 0 or not self.players:
+            return
+
+        for player in self.players:
+            pos = player["worldPosition"]
+            if pos["x"] == 0 and pos["y"] == 0 and pos["z"] == 0:
+                # Dead players respawn after a while
+                if self.rng.random() < elapsed / 10:
+                    player["worldPosition"] = self._random_position()
+                continue
+
+            # Walk around at roughly 5 m/s
+            step = 500 * elapsed
+            pos["x"] = round(max(-100000, min(100000, pos["x"] + self.rng.uniform(-step, step))), 2)
+            pos["y"] = round(max(-100000, min(100000, pos["y"] + self.rng.uniform(-step, step))), 2)
+
+        # On average, one kill per 20 players per second
+        self._pending_kills += len(self.players) * elapsed / 20
+        while self._pending_kills >= 1 and len(self.players) >= 2:
+            self._pending_kills -= 1
+            killer, victim = self.rng.sample(self.players, 2)
+            killer["kills"] += 1
+            killer["scoreData"]["cOMBAT"] += 3
+            victim["deaths"] += 1
+            victim["worldPosition"] = {"x": 0, "y": 0, "z": 0}
+            self.log(
+                f"KILL: {killer['name']}({self._faction(killer)}/{killer['iD']}) -> "
+                f"{victim['name']}({self._faction(victim)}/{victim['iD']}) with {self.rng.choice(WEAPONS)}"
+            )
+
+    @staticmethod
+    def _faction(player: GetPlayerResponse) -> str:
+        return "Axis" if player["team"] in (PlayerTeam.GER, PlayerTeam.DAK) else "Allies"
+
+    def get_admin_log(self, seconds_span: int, filter: str = "") -> list[AdminLogResponseEntry]:
+        since = time.time() - seconds_span
+        entries: list[AdminLogResponseEntry] = []
+        for timestamp, message in reversed(self.admin_log):
+            if timestamp < since:
+                break
+            if filter in message:
+                entries.append({
+                    "timestamp": datetime.fromtimestamp(timestamp).strftime("%Y.%m.%d-%H.%M.%S"),
+                    "message": message,
+                })
+        entries.reverse()
+        return entries
+
+    def change_map(self, map_name: str) -> bool:
+        for entry in self.map_rotation:
+            if entry["iD"] == map_name or entry["name"] == map_name:
+                self.log(f"MATCH ENDED `{self.map_name} Warfare` ALLIED (2 - 3) AXIS")
+                self.map_name = entry["name"]
+                self.log(f"MATCH START {self.map_name} Warfare")
+                return True
+        return False
+
+class MockCommandError(Exception):
+    def __init__(self, status_code: RconResponseStatus, message: str) -> None:
+        self.status_code = status_code
+        self.message = message
+        super().__init__(message)
+
+class MockHLLServerProtocol(asyncio.Protocol):
+    def __init__(self, server: 'MockHLLServer') -> None:
+        self.server = server
+        self.loop = asyncio.get_running_loop()
+        self._transport: asyncio.Transport | None = None
+        self._buffer = bytearray()
+        self._xor = XorCodec()
+        self._auth_token: str | None = None
+        self._response_id = 0
+        self._queue: asyncio.Queue[tuple[float, int, dict]] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    def connection_made(self, transport):
+        self._transport = transport # type: ignore
+        self.server.connections.add(self)
+        if self.server.serialize_requests:
+            self._task = asyncio.create_task(self._process_loop())
+        if DO_POP_V1_XORKEY:
+            # The legacy XOR key, which clients are expected to ignore
+            transport.write(os.urandom(4))
+
+    def connection_lost(self, exc):
+        self._transport = None
+        self.server.connections.discard(self)
+        if self._task:
+            self._task.cancel()
+
+    def data_received(self, data: bytes):
+        self._buffer += data
+        for request_id, request in self._read_requests():
+            self.server.stats["requests"] += 1
+            self.server.stats[f"requests:{request.get('name')}"] += 1
+
+            if self.server.disconnect_rate and random.random() < self.server.disconnect_rate:
+                self.server.stats["disconnects"] += 1
+                assert self._transport is not None
+                self._transport.abort()
+                return
+
+            if self.server.drop_rate and random.random() < self.server.drop_rate:
+                self.server.stats["dropped"] += 1
+                continue
+
+            delay = max(0.0, self.server.latency + random.uniform(-self.server.jitter, self.server.jitter))
+            if self.server.serialize_requests:
+                self._queue.put_nowait((delay, request_id, request))
+            else:
+                self.loop.call_later(delay, self._respond, request_id, request)
+
+        if self.server.slow_read_delay and self._transport:
+            # Pretend we're busy, and let the client's writes pile up
+            self._transport.pause_reading()
+            self.loop.call_later(self.server.slow_read_delay, self._resume_reading)
+
+    def _resume_reading(self):
+        if self._transport:
+            self._transport.resume_reading()
+
+    def _read_requests(self):
+        offset = 0
+        try:
+            while offset < len(self._buffer):
+                if DO_USE_REQUEST_HEADERS:
+                    if len(self._buffer) - offset < HEADER_SIZE:
+                        break
+                    header = self._xor.apply(self._buffer[offset:offset + HEADER_SIZE])
+                    request_id, body_len = struct.unpack(HEADER_FORMAT, header)
+                    end = offset + HEADER_SIZE + body_len
+                    if end > len(self._buffer):
+                        break
+                    body = self._xor.apply(self._buffer[offset + HEADER_SIZE:end], offset=HEADER_SIZE)
+                    request = json.loads(body)
+                else:
+                    # Without headers we don't know where a request ends until we
+                    # manage to parse it
+                    decoded = self._xor.apply(self._buffer[offset:]).decode(errors="replace")
+                    try:
+                        request, end_char = json.JSONDecoder().raw_decode(decoded)
+                    except json.JSONDecodeError:
+                        break
+                    request_id = 0
+                    end = offset + len(decoded[:end_char].encode())
+
+                offset = end
+                yield request_id, request
+        finally:
+            del self._buffer[:offset]
+
+    async def _process_loop(self):
+        # Like the real server, handle one request at a time
+        while True:
+            delay, request_id, request = await self._queue.get()
+            if delay:
+                await asyncio.sleep(delay)
+            self._respond(request_id, request)
+
+    def _respond(self, request_id: int, request: dict):
+        if not self._transport:
+            return
+
+        name = str(request.get("name"))
+        try:
+            content_body = self._handle(request)
+        except MockCommandError as e:
+            status_code, status_message, content_body = e.status_code, e.message, ""
+        except Exception:
+            self.server.logger.exception("Mock server failed to handle request %s", name)
+            status_code, status_message, content_body = RconResponseStatus.INTERNAL_ERROR, "Internal error", ""
+        else:
+            status_code, status_message = RconResponseStatus.OK, "OK"
+
+        body = serialization.dumps({
+            "statusCode": int(status_code),
+            "statusMessage": status_message,
+            "version": request.get("version", 2),
+            "name": name,
+            "contentBody": content_body,
+        })
+
+        if not DO_USE_REQUEST_HEADERS:
+            self._response_id += 1
+            request_id = self._response_id
+        self._transport.write(struct.pack(HEADER_FORMAT, request_id, len(body)) + self._xor.apply(body))
+
+        if name == "ServerConnect" and status_code == RconResponseStatus.OK:
+            # Everything after the handshake is encrypted
+            self._xor.key = self.server.xorkey
+
+    def _handle(self, request: dict) -> str:
+        name = request.get("name")
+        raw_body = request.get("contentBody", "")
+
+        if name == "ServerConnect":
+            return base64.b64encode(self.server.xorkey).decode()
+
+        if name == "Login":
+            if raw_body != self.server.password:
+                raise MockCommandError(RconResponseStatus.UNAUTHORIZED, "Invalid password")
+            self._auth_token = secrets.token_hex(16)
+            return self._auth_token
+
+        if not self._auth_token or request.get("authToken") != self._auth_token:
+            raise MockCommandError(RconResponseStatus.UNAUTHORIZED, "Unauthorized")
+
+        try:
+            body: Any = json.loads(raw_body) if raw_body else {}
+        except json.JSONDecodeError:
+            body = raw_body
+
+        state = self.server.state
+        match name:
+            case "ServerInformation":
+                return serialization.dumps(self._server_information(body)).decode()
+
+            case "AdminLog":
+                state.tick()
+                entries = state.get_admin_log(int(body["LogBackTrackTime"]), body.get("Filters", ""))
+                return serialization.dumps({"entries": entries}).decode()
+
+            case "DisplayableCommands":
+                entries: list[GetAllCommandsResponseEntry] = [
+                    {"iD": command, "friendlyName": command, "isClientSupported": True}
+                    for command in sorted(NOOP_COMMANDS)
+                ]
+                return serialization.dumps({"entries": entries}).decode()
+
+            case "ClientReferenceData":
+                return serialization.dumps({
+                    "name": body, "text": body, "description": f"Executes {body}", "dialogueParameters": [],
+                }).decode()
+
+            case "Kick" | "PermanentBan" | "TemporaryBan":
+                player = state.remove_player(body["PlayerId"])
+                if not player:
+                    raise MockCommandError(RconResponseStatus.BAD_REQUEST, "Player not found")
+                state.log(f"KICK: [{player['name']}] has been kicked. [{body.get('Reason', '')}]")
+                # Someone else takes their spot
+                state.add_player()
+                return ""
+
+            case "PunishPlayer":
+                player = state.get_player(body["PlayerId"])
+                if not player:
+                    raise MockCommandError(RconResponseStatus.BAD_REQUEST, "Player not found")
+                player["worldPosition"] = {"x": 0, "y": 0, "z": 0}
+                return ""
+
+            case "ChangeMap":
+                if not state.change_map(body["MapName"]):
+                    raise MockCommandError(RconResponseStatus.BAD_REQUEST, "Unknown map")
+                return ""
+
+            case "AddMapToRotation" | "AddMapToSequence":
+                maps = state.map_rotation if name == "AddMapToRotation" else state.map_sequence
+                entry = next((m for m in state.map_rotation if m["iD"] == body["MapName"]), None)
+                if not entry:
+                    raise MockCommandError(RconResponseStatus.BAD_REQUEST, "Unknown map")
+                maps.insert(int(body["Index"]), dict(entry)) # type: ignore
+                self._renumber(maps)
+                return ""
+
+            case "RemoveMapFromRotation" | "RemoveMapFromSequence":
+                maps = state.map_rotation if name == "RemoveMapFromRotation" else state.map_sequence
+                try:
+                    maps.pop(int(body["Index"]))
+                except IndexError:
+                    raise MockCommandError(RconResponseStatus.BAD_REQUEST, "Invalid index")
+                self._renumber(maps)
+                return ""
+
+            case "MoveMapFromSequence":
+                try:
+                    entry = state.map_sequence.pop(int(body["CurrentIndex"]))
+                except IndexError:
+                    raise MockCommandError(RconResponseStatus.BAD_REQUEST, "Invalid index")
+                state.map_sequence.insert(int(body["NewIndex"]), entry)
+                self._renumber(state.map_sequence)
+                return ""
+
+            case _ if name in NOOP_COMMANDS:
+                return ""
+
+            case _:
+                raise MockCommandError(RconResponseStatus.BAD_REQUEST, f"Unknown command {name}")
+
+    @staticmethod
+    def _renumber(maps: list[GetMapRotationResponseEntry]):
+        for i, entry in enumerate(maps):
+            entry["position"] = i
+
+    def _server_information(self, body: dict) -> dict:
+        state = self.server.state
+        match body.get("Name"):
+            case "players":
+                state.tick()
+                return {"players": state.players}
+            case "player":
+                state.tick()
+                player = state.get_player(body.get("Value", ""))
+                if not player:
+                    raise MockCommandError(RconResponseStatus.BAD_REQUEST, "Player not found")
+                return player # type: ignore
+            case "session":
+                return {
+                    "serverName": state.server_name,
+                    "mapName": state.map_name,
+                    "gameMode": "Warfare",
+                    "playerCount": len(state.players),
+                    "queueCount": 0,
+                    "maxQueueCount": 6,
+                    "vIPQueueCount": 0,
+                    "maxVIPQueueCount": 2,
+                }
+            case "serverconfig":
+                return {
+                    "serverName": state.server_name,
+                    "buildNumber": "0",
+                    "buildRevision": "0",
+                    "supportedPlatforms": ["Steam", "WinGDK", "eos"],
+                }
+            case "maprotation":
+                return {"mAPS": state.map_rotation}
+            case "mapsequence":
+                return {"mAPS": state.map_sequence}
+            case _:
+                raise MockCommandError(RconResponseStatus.BAD_REQUEST, "Unknown information requested")
+
+class MockHLLServer:
+    """A stand-in for a Hell Let Loose game server, for testing and benchmarking
+    clients without a live server.
+
+    - `latency` and `jitter` delay each response, in seconds.
+    - `serialize_requests` handles the requests of a connection one at a time, in
+    order, like the real server does. When disabled, responses may arrive out of
+    order, which only works for clients that use request headers.
+    - `drop_rate` is the chance that a request never gets a response.
+    - `disconnect_rate` is the chance that a request makes the server abort the
+    connection.
+    - `slow_read_delay` makes the server stop reading from a connection for a
+    while after every read.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        password: str = "password",
+        player_count: int = 100,
+        latency: float = 0.02,
+        jitter: float = 0.005,
+        serialize_requests: bool = True,
+        drop_rate: float = 0.0,
+        disconnect_rate: float = 0.0,
+        slow_read_delay: float = 0.0,
+        logger: logging.Logger = logging, # type: ignore
+    ) -> None:
+        self.host = host
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.serialize_requests = serialize_requests
+        self.drop_rate = drop_rate
+        self.disconnect_rate = disconnect_rate
+        self.slow_read_delay = slow_read_delay
+        self.logger = logger
+
+        self.state = MockGameState(player_count)
+        self.xorkey = os.urandom(32)
+        self.stats: Counter[str] = Counter()
+        self.connections: set[MockHLLServerProtocol] = set()
+
+        self._port = port
+        self._server: asyncio.Server | None = None
+
+    @property
+    def port(self) -> int:
+        if self._server and self._server.sockets:
+            return self._server.sockets[0].getsockname()[1]
+        return self._port
+
+    def is_started(self) -> bool:
+        return self._server is not None
+
+    async def start(self) -> None:
+        if self._server:
+            return
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(
+            lambda: MockHLLServerProtocol(self),
+            host=self.host,
+            port=self._port,
+        )
+        self.logger.info("Mock server listening on %s:%s", self.host, self.port)
+
+    async def stop(self) -> None:
+        if not self._server:
+            return
+        self._server.close()
+        for connection in list(self.connections):
+            if connection._transport:
+                connection._transport.abort()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
@@ -1,10 +1,10 @@
 
 from enum import IntEnum
 import itertools
-import json
 import struct
 from typing import ClassVar
 
+from lib import serialization
 from lib.constants import DO_USE_REQUEST_HEADERS, HEADER_FORMAT
 from lib.exceptions import HLLCommandError
 
@@ -17,6 +17,15 @@ class RconResponseStatus(IntEnum):
 class RconRequest:
     __uid: ClassVar[itertools.count] = itertools.count(start=1)
 
+    # Read-only commands that tend to be polled with the exact same body, and are
+    # therefore worth keeping pre-serialized
+    TEMPLATE_COMMANDS: ClassVar[frozenset[str]] = frozenset({
+        "ServerInformation",
+        "AdminLog",
+        "DisplayableCommands",
+        "ClientReferenceData",
+    })
+
     def __init__(self, command: str, version: int, auth_token: str | None, content_body: dict | str = ""):
         self.name = command
         self.version = version
@@ -24,7 +33,28 @@ class RconRequest:
         self.content_body = content_body
         self.id = next(self.__uid)
 
-    def pack(self) -> bytes:
+    @property
+    def template_key(self) -> tuple | None:
+        """A key under which the packed body of this request can be cached, or
+        `None` if it should not be cached."""
+        if self.name not in self.TEMPLATE_COMMANDS:
+            return None
+
+        if isinstance(self.content_body, str):
+            body_key = self.content_body
+        else:
+            body_key = tuple(self.content_body.items())
+            try:
+                hash(body_key)
+            except TypeError:
+                return None
+
+        return (self.name, self.version, body_key, self.auth_token)
+
+    def pack_header(self, body_len: int) -> bytes:
+        return struct.pack(HEADER_FORMAT, self.id, body_len)
+
+    def pack_body(self) -> bytes:
         body = {
             "authToken": self.auth_token or "",
             "version": self.version,
@@ -32,13 +62,15 @@ class RconRequest:
             "contentBody": (
                 self.content_body
                 if isinstance(self.content_body, str)
-                else json.dumps(self.content_body)
+                else serialization.dumps(self.content_body).decode()
             )
         }
-        body_encoded = json.dumps(body).encode()
+        return serialization.dumps(body)
+
+    def pack(self) -> bytes:
+        body_encoded = self.pack_body()
         if DO_USE_REQUEST_HEADERS:
-            header = struct.pack(HEADER_FORMAT, self.id, len(body_encoded))
-            return header + body_encoded
+            return self.pack_header(len(body_encoded)) + body_encoded
         else:
             return body_encoded
 
@@ -53,19 +85,19 @@ class RconResponse:
     
     @property
     def content_dict(self) -> dict:
-        return json.loads(self.content_body)
+        return serialization.loads(self.content_body)
     
     def __str__(self):
         try:
             content = self.content_dict
-        except json.JSONDecodeError:
+        except serialization.JSONDecodeError:
             content = self.content_body
 
         return f"{self.status_code} {self.name} {content}"
 
     @classmethod
     def unpack(cls, id: int, body_encoded: bytes):
-        body = json.loads(body_encoded)
+        body = serialization.loads(body_encoded)
         return cls(
             id=id,
             command=str(body["name"]),
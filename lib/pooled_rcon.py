@@ -1,11 +1,64 @@
 import asyncio
+from collections import Counter, deque
 import functools
+import heapq
+import itertools
 import logging
+import random
+import statistics
 import time
+from typing import Iterable, Literal
 from lib.commands import RconCommands
 from lib.rcon import Rcon
 from lib.abc import RconClient
-from lib.exceptions import HLLCommandError, HLLConnectionError
+from lib.circuitbreaker import CircuitState, get_circuit_breaker
+from lib.executors import COALESCED_COMMANDS
+from lib.exceptions import HLLCircuitOpenError, HLLCommandError, HLLConnectionError, HLLQueueFullError
+from lib.metrics import MetricsRegistry, registry as metrics
+from lib.utils import get_command_name
+
+# How often to reconsider the size of an autoscaling pool
+AUTOSCALE_INTERVAL = 1.0
+# Grow the pool when commands wait longer than this on average before being sent...
+SCALE_UP_QUEUE_WAIT = 0.25
+# ...or when there are this many commands queued per worker...
+SCALE_UP_QUEUE_DEPTH = 2
+# ...for this many consecutive intervals
+SCALE_UP_INTERVALS = 2
+# Shrink the pool when its workers are busy less than this fraction of the time...
+SCALE_DOWN_UTILIZATION = 0.3
+# ...for this many seconds straight
+SCALE_DOWN_AFTER = 30.0
+
+# Priority lanes. Commands with a lower number are always sent first.
+PRIORITY_HIGH = 1
+PRIORITY_DEFAULT = 10
+PRIORITY_LOW = 20
+# Lanes that commands go into unless specified otherwise
+COMMAND_PRIORITIES: dict[str, int] = {
+    "Kick": PRIORITY_HIGH,
+    "TemporaryBan": PRIORITY_HIGH,
+    "PermanentBan": PRIORITY_HIGH,
+    "PunishPlayer": PRIORITY_HIGH,
+}
+
+# How much weight the latest response time has in a worker's average latency
+LATENCY_EWMA_ALPHA = 0.2
+# Stop sending commands to a worker for a while when its average latency is this
+# many times that of the other workers...
+QUARANTINE_LATENCY_FACTOR = 3.0
+# ...and also at least this high...
+QUARANTINE_MIN_LATENCY = 0.1
+# ...or when this many commands in a row failed to get a response
+QUARANTINE_FAILURES = 3
+QUARANTINE_DURATION = 10.0
+
+# Number of recent response times per command to base the hedging delay on...
+HEDGE_LATENCY_SAMPLES = 200
+# ...and how many are needed before hedging at all
+HEDGE_MIN_SAMPLES = 20
+# Hedges that may be sent in quick succession, for instance during a spike
+HEDGE_BURST = 10
 
 @functools.total_ordering
 class QueuedCommand:
@@ -15,120 +68,240 @@ class QueuedCommand:
         version: int,
         body: str | dict = "",
         attempts: int = 1,
+        deadline: float | None = None,
     ) -> None:
         self.command = command
         self.version = version
         self.body = body
         self.attempts = attempts
+        # In terms of time.monotonic()
+        self.deadline = deadline
+
+        # The worker that executed it, and a worker to avoid when possible
+        self.worker: 'RconWorker | None' = None
+        self.avoid_worker: 'RconWorker | None' = None
 
         self._result: asyncio.Future[str] = asyncio.Future()
         self._submit_time = time.monotonic()
+        self._sort_key = (float("inf") if deadline is None else deadline, self._submit_time)
     
+    def is_done(self) -> bool:
+        # Also true when the caller stopped waiting for it
+        return self._result.done()
+
+    def is_expired(self) -> bool:
+        return self.deadline is not None and self.deadline <= time.monotonic()
+
+    def get_timeout(self) -> float | None:
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
     def set_result(self, value: str) -> None:
-        self._result.set_result(value)
+        if not self._result.done():
+            self._result.set_result(value)
     
     def set_exception(self, exception: Exception) -> None:
-        self._result.set_exception(exception)
+        if not self._result.done():
+            self._result.set_exception(exception)
     
     def __await__(self):
         return self._result.__await__()
     
+    # Earliest deadline first, then first come first serve
     def __eq__(self, other):
         if isinstance(other, QueuedCommand):
-            return self._submit_time == other._submit_time
+            return self._sort_key == other._sort_key
         return NotImplemented
 
     def __lt__(self, other):
         if isinstance(other, QueuedCommand):
-            return self._submit_time < other._submit_time
+            return self._sort_key < other._sort_key
         return NotImplemented
 
+class CommandQueue:
+    """A priority queue of `(priority, command)` pairs. Unlike
+    `asyncio.PriorityQueue`, it can also give up its least important item."""
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[int, QueuedCommand]] = []
+        self._not_empty = asyncio.Event()
+
+    def qsize(self) -> int:
+        return len(self._heap)
+
+    def put_nowait(self, item: tuple[int, QueuedCommand]) -> None:
+        heapq.heappush(self._heap, item)
+        self._not_empty.set()
+
+    async def get(self) -> tuple[int, QueuedCommand]:
+        while not self._heap:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return heapq.heappop(self._heap)
+
+    def peek_lowest(self) -> tuple[int, QueuedCommand]:
+        # The heap doesn't keep track of its largest item, but this is only
+        # needed while the queue is full
+        return max(self._heap)
+
+    def remove(self, item: tuple[int, QueuedCommand]) -> None:
+        self._heap.remove(item)
+        heapq.heapify(self._heap)
+
 class RconWorker(RconClient):
-    def __init__(self, pool: 'PooledRcon') -> None:
+    def __init__(self, pool: 'PooledRcon', id: int) -> None:
         self.pool = pool
+        self.id = id
         self.rcon = Rcon(
             host=pool.host,
             port=pool.port,
             password=pool.password,
+            max_in_flight=pool.worker_max_in_flight,
+            handshake_semaphore=pool._handshakes,
             logger=pool.logger,
         )
-        self._task: asyncio.Task | None = None
+
+        self.in_flight = 0
+        self.latency: float | None = None
+        self.failures = 0
+        self.quarantined_until = 0.0
+        self._tasks: set[asyncio.Task] = set()
     
     def is_started(self) -> bool:
-        return self.rcon.is_started() and self._is_task_started()
+        return self.rcon.is_started()
 
     def is_connected(self) -> bool:
         return self.rcon.is_connected()
 
+    def is_busy(self) -> bool:
+        return self.in_flight > 0
+
+    def is_quarantined(self) -> bool:
+        return self.quarantined_until > time.monotonic()
+
+    def has_capacity(self) -> bool:
+        return self.is_connected() and self.in_flight < self.pool.worker_max_in_flight
+
+    def get_score(self, default_latency: float) -> float:
+        # The expected time until this worker would be done with another command
+        return (self.in_flight + 1) * (self.latency or default_latency)
+
     async def wait_until_connected(self, timeout: float | None = None) -> None:
         return await self.rcon.wait_until_connected(timeout=timeout)
 
-    def _is_task_started(self) -> bool:
-        return self._task is not None and not self._task.done()
-
     def start(self) -> None:
         self.rcon.start()
-        if not self._is_task_started():
-            self._task = asyncio.create_task(self._loop())
 
     def stop(self) -> None:
         self.rcon.stop()
-        if self._is_task_started():
-            assert self._task is not None
-            self._task.cancel()
-        self._task = None
+        for task in list(self._tasks):
+            task.cancel()
 
-    async def execute(self, command: str, version: int, body: str | dict = "") -> str:
+    async def execute(self, command: str, version: int, body: str | dict = "", timeout: float | None = None) -> str:
         return await self.rcon.execute(
             command=command,
             version=version,
             body=body,
+            timeout=timeout,
         )
-    
-    async def _loop(self):
-        while True:
-            try:
-                try:
-                    await self.wait_until_connected()
-                except HLLConnectionError:
-                    if not self.rcon.is_started():
-                        # The connection was stopped
-                        self.pool.logger.warning("Worker %r exiting prematurely due to client having been stopped", self)
-                        return
-                    await asyncio.sleep(0.5)
-                    continue
-
-                priority, entry = await self.pool._queue.get()
-                if not self.is_connected():
-                    # We lost connection while waiting. Put entry back at the front of the queue.
-                    self.pool.enqueue(entry, priority=max(priority - 1, 1))
-                
-                else:
-                    try:
-                        response = await self.execute(
-                            command=entry.command,
-                            version=entry.version,
-                            body=entry.body,
-                        )
-                    except HLLConnectionError:
-                        # We lost connection while executing the command. Enqueue it again.
-                        self.pool.enqueue(entry, priority=max(priority - 1, 1))
-                    except HLLCommandError as e:
-                        # Command failed. Put back in the queue if we have any attempts remaining.
-                        if entry.attempts > 1:
-                            entry.attempts -= 1
-                            self.pool.enqueue(entry, priority=max(priority - 1, 1))
-                        else:
-                            entry.set_exception(e)
-                    else:
-                        entry.set_result(response)
 
-            except asyncio.CancelledError:
-                return
-            
-            except:
-                self.pool.logger.exception("Worker %r encountered unexpected error", self)
-                await asyncio.sleep(1) # Go easy
+    def dispatch(self, entry: 'QueuedCommand', priority: int) -> None:
+        entry.worker = self
+        self.in_flight += 1
+        task = asyncio.create_task(self._run(entry, priority))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, entry: 'QueuedCommand', priority: int):
+        started_at = time.monotonic()
+        queue_wait = started_at - entry._submit_time
+        self.pool._queue_wait_total += queue_wait
+        self.pool._queue_wait_count += 1
+        metrics.observe("rcon_pool_queue_wait_seconds", (self.pool.server,), queue_wait)
+        try:
+            response = await self.execute(
+                command=entry.command,
+                version=entry.version,
+                body=entry.body,
+                timeout=entry.get_timeout(),
+            )
+        except HLLCircuitOpenError as e:
+            # The server is failing, so retrying would only make things worse
+            entry.set_exception(e)
+        except HLLConnectionError:
+            # We lost connection while executing the command. Enqueue it again.
+            self._record_failure()
+            metrics.inc("rcon_pool_retries_total", (self.pool.server, entry.command, "connection"))
+            self.pool.enqueue(entry, priority=max(priority - 1, 1))
+        except asyncio.TimeoutError as e:
+            # No response in time. Retry elsewhere if we have any attempts remaining.
+            self._record_failure()
+            if entry.attempts > 1 and not entry.is_expired():
+                entry.attempts -= 1
+                metrics.inc("rcon_pool_retries_total", (self.pool.server, entry.command, "timeout"))
+                self.pool.enqueue(entry, priority=max(priority - 1, 1))
+            else:
+                entry.set_exception(e)
+        except HLLCommandError as e:
+            # Command failed. Put back in the queue if we have any attempts remaining.
+            self._record_latency(time.monotonic() - started_at)
+            if entry.attempts > 1:
+                entry.attempts -= 1
+                metrics.inc("rcon_pool_retries_total", (self.pool.server, entry.command, "command"))
+                self.pool.enqueue(entry, priority=max(priority - 1, 1))
+            else:
+                entry.set_exception(e)
+        except asyncio.CancelledError:
+            # The worker was stopped. Let another worker take over.
+            self.pool.enqueue(entry, priority=max(priority - 1, 1))
+            raise
+        except Exception as e:
+            self.pool.logger.exception("Worker %r encountered unexpected error", self)
+            entry.set_exception(e)
+        else:
+            self._record_latency(time.monotonic() - started_at)
+            entry.set_result(response)
+        finally:
+            self.in_flight -= 1
+            busy_time = time.monotonic() - started_at
+            self.pool._busy_time += busy_time
+            metrics.inc("rcon_pool_worker_busy_seconds_total", (self.pool.server, self.id), busy_time)
+            self.pool._worker_available.set()
+
+    def _record_latency(self, latency: float):
+        self.failures = 0
+        if self.is_quarantined():
+            # Stragglers from before the quarantine
+            return
+
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_EWMA_ALPHA * (latency - self.latency)
+
+        # Compare against the rest of the pool
+        others = [w.latency for w in self.pool._workers if w is not self and w.latency is not None]
+        if others:
+            typical_latency = statistics.median(others)
+            if self.latency > max(QUARANTINE_MIN_LATENCY, typical_latency * QUARANTINE_LATENCY_FACTOR):
+                self.pool.logger.warning(
+                    "Quarantining worker %r, its latency is %.3fs compared to %.3fs",
+                    self, self.latency, typical_latency
+                )
+                self._quarantine(typical_latency)
+
+    def _record_failure(self):
+        self.failures += 1
+        if self.failures >= QUARANTINE_FAILURES and not self.is_quarantined():
+            self.pool.logger.warning("Quarantining worker %r after %s failures", self, self.failures)
+            self._quarantine(self.latency)
+
+    def _quarantine(self, latency_after: float | None):
+        self.quarantined_until = time.monotonic() + QUARANTINE_DURATION
+        # Give it a fair chance once the quarantine is over
+        self.latency = latency_after
+        self.failures = 0
 
 class PooledRcon(RconClient):
     def __init__(
@@ -137,18 +310,61 @@ class PooledRcon(RconClient):
         port: int,
         password: str,
         pool_size: int,
-        logger: logging.Logger = logging # type: ignore
+        logger: logging.Logger = logging, # type: ignore
+        *,
+        min_pool_size: int | None = None,
+        max_pool_size: int | None = None,
+        max_concurrent_handshakes: int = 5,
+        worker_max_in_flight: int = 1,
+        max_queue_size: int = 10_000,
+        shed_policy: Literal["reject_new", "drop_lowest"] = "drop_lowest",
+        hedging: bool = False,
+        hedge_commands: Iterable[str] = COALESCED_COMMANDS,
+        hedge_percentile: float = 0.95,
+        hedge_budget: float = 0.05,
     ) -> None:
         self.host = host
         self.port = port
         self.password = password
         self.pool_size = pool_size
+        # When these differ, the pool grows and shrinks between them depending on load
+        self.min_pool_size = pool_size if min_pool_size is None else min_pool_size
+        self.max_pool_size = pool_size if max_pool_size is None else max_pool_size
+        self.worker_max_in_flight = worker_max_in_flight
+        # What to do once this many commands are queued. Either reject the new
+        # command, or drop whichever command is least important.
+        self.max_queue_size = max_queue_size
+        self.shed_policy = shed_policy
+        # Send read-only commands to a second worker when the first takes longer
+        # than usual, for at most a fraction of the requests
+        self.hedging = hedging
+        self.hedge_commands = frozenset(hedge_commands)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
         self.logger = logger
+        self.server = f"{host}:{port}"
 
         self.commands = RconCommands(self)
 
         self._workers: list[RconWorker] = []
-        self._queue: asyncio.PriorityQueue[tuple[int, QueuedCommand]] = asyncio.PriorityQueue()
+        self._worker_ids = itertools.count(1)
+        self._queue = CommandQueue()
+        self._dispatch_task: asyncio.Task | None = None
+        self._worker_available = asyncio.Event()
+        # Prevents a reconnect storm from overwhelming the server
+        self._handshakes = asyncio.Semaphore(max_concurrent_handshakes)
+
+        self._autoscale_task: asyncio.Task | None = None
+        self._queue_wait_total = 0.0
+        self._queue_wait_count = 0
+        self._busy_time = 0.0
+        self._scale_up_intervals = 0
+        self._underutilized_since: float | None = None
+
+        self._hedge_latencies: dict[str, deque[float]] = {}
+        self._hedge_thresholds: dict[str, tuple[int, float]] = {}
+        self._hedge_tokens = float(HEDGE_BURST)
+        self._hedge_stats: Counter[str] = Counter()
     
     def is_started(self):
         return any(
@@ -179,36 +395,339 @@ class PooledRcon(RconClient):
             
         raise HLLConnectionError("All workers are disconnected")
 
+    def is_autoscaling(self):
+        return self.max_pool_size > self.min_pool_size
+
     def start(self):
         if self.is_started():
             self.stop()
         
-        self._workers = [
-            RconWorker(self)
-            for _ in range(self.pool_size)
-        ]
-        for worker in self._workers:
-            worker.start()
+        pool_size = min(max(self.pool_size, self.min_pool_size), self.max_pool_size)
+        for _ in range(pool_size):
+            self._add_worker()
+
+        self._dispatch_task = asyncio.create_task(self._dispatch_loop())
+        metrics.add_collector(self._collect_metrics)
+
+        if self.is_autoscaling():
+            self._autoscale_task = asyncio.create_task(self._autoscale_loop())
 
     def stop(self):
+        metrics.remove_collector(self._collect_metrics)
+
+        if self._dispatch_task:
+            self._dispatch_task.cancel()
+            self._dispatch_task = None
+
+        if self._autoscale_task:
+            self._autoscale_task.cancel()
+            self._autoscale_task = None
+
         for worker in self._workers:
             worker.stop()
         self._workers.clear()
 
+    def _add_worker(self) -> RconWorker:
+        worker = RconWorker(self, next(self._worker_ids))
+        self._workers.append(worker)
+        worker.start()
+        return worker
+
+    def _remove_worker(self, worker: RconWorker) -> None:
+        worker.stop()
+        self._workers.remove(worker)
+
+    async def _dispatch_loop(self):
+        while True:
+            priority, entry = await self._queue.get()
+            if self._drop_if_stale(entry):
+                continue
+
+            try:
+                worker = await self._get_worker(avoid=entry.avoid_worker)
+            except asyncio.CancelledError:
+                self.enqueue(entry, priority=priority)
+                raise
+
+            if worker is None:
+                # All workers are disconnected and the server keeps failing
+                entry.set_exception(HLLCircuitOpenError("Circuit for %s is open" % self.server))
+                continue
+
+            # We might have waited a while for a worker
+            if self._drop_if_stale(entry):
+                continue
+            worker.dispatch(entry, priority)
+
+    def _drop_if_stale(self, entry: QueuedCommand) -> bool:
+        if entry.is_done():
+            self.logger.debug("Dropping %s command, caller is no longer waiting", entry.command)
+            metrics.inc("rcon_pool_dropped_total", (self.server, "cancelled"))
+            return True
+        elif entry.is_expired():
+            self.logger.debug("Dropping %s command, deadline has passed", entry.command)
+            entry.set_exception(asyncio.TimeoutError())
+            metrics.inc("rcon_pool_dropped_total", (self.server, "expired"))
+            return True
+        return False
+
+    async def _get_worker(self, avoid: RconWorker | None = None) -> RconWorker | None:
+        breaker = get_circuit_breaker(self.host, self.port)
+        while True:
+            self._worker_available.clear()
+
+            workers = [w for w in self._workers if w.has_capacity()]
+            # Avoid quarantined workers, unless they are all we have
+            healthy_workers = [w for w in workers if not w.is_quarantined()]
+            workers = healthy_workers or workers
+            if avoid and len(workers) > 1:
+                workers = [w for w in workers if w is not avoid]
+
+            if len(workers) == 1:
+                return workers[0]
+            elif workers:
+                # Pick the better of two random workers. Unlike always picking the
+                # best one, this doesn't overwhelm a worker that just happens to look
+                # fast for a moment.
+                latencies = [w.latency for w in workers if w.latency is not None]
+                default_latency = statistics.median(latencies) if latencies else 1.0
+                return min(random.sample(workers, 2), key=lambda w: w.get_score(default_latency))
+
+            if breaker.state != CircuitState.CLOSED and not self.is_connected():
+                return None
+
+            # Wait for a worker to free up. Since workers don't tell us when they
+            # (re)connect, check again every so often regardless.
+            try:
+                await asyncio.wait_for(self._worker_available.wait(), timeout=0.1)
+            except asyncio.TimeoutError:
+                pass
+
+    def get_worker_stats(self) -> list[dict]:
+        return [
+            {
+                "id": worker.id,
+                "connected": worker.is_connected(),
+                "in_flight": worker.in_flight,
+                "latency": worker.latency,
+                "quarantined": worker.is_quarantined(),
+            }
+            for worker in self._workers
+        ]
+
+    def _collect_metrics(self, registry: MetricsRegistry):
+        registry.set("rcon_pool_queue_depth", (self.server,), self._queue.qsize())
+        registry.set("rcon_pool_workers", (self.server,), len(self._workers))
+        for worker in self._workers:
+            registry.set("rcon_pool_worker_in_flight", (self.server, worker.id), worker.in_flight)
+            if worker.latency is not None:
+                registry.set("rcon_pool_worker_latency_seconds", (self.server, worker.id), worker.latency)
+
+    async def _autoscale_loop(self):
+        while True:
+            await asyncio.sleep(AUTOSCALE_INTERVAL)
+            try:
+                self._autoscale()
+            except Exception:
+                self.logger.exception("Failed to autoscale pool")
+
+    def _autoscale(self):
+        now = time.monotonic()
+        num_workers = len(self._workers)
+        queue_depth = self._queue.qsize()
+        queue_wait = self._queue_wait_total / self._queue_wait_count if self._queue_wait_count else 0.0
+        utilization = self._busy_time / (max(num_workers, 1) * self.worker_max_in_flight * AUTOSCALE_INTERVAL)
+        self._queue_wait_total = 0.0
+        self._queue_wait_count = 0
+        self._busy_time = 0.0
+
+        if queue_wait >= SCALE_UP_QUEUE_WAIT or queue_depth >= SCALE_UP_QUEUE_DEPTH * num_workers:
+            self._underutilized_since = None
+            self._scale_up_intervals += 1
+            if self._scale_up_intervals >= SCALE_UP_INTERVALS and num_workers < self.max_pool_size:
+                # Grow by half of the current size, to keep up with bursts
+                num_new_workers = min(self.max_pool_size - num_workers, max(1, num_workers // 2))
+                self.logger.info(
+                    "Growing pool from %s to %s workers (queue depth %s, queue wait %.3fs)",
+                    num_workers, num_workers + num_new_workers, queue_depth, queue_wait
+                )
+                for _ in range(num_new_workers):
+                    self._add_worker()
+                self._scale_up_intervals = 0
+            return
+
+        self._scale_up_intervals = 0
+
+        if queue_depth == 0 and utilization < SCALE_DOWN_UTILIZATION:
+            if self._underutilized_since is None:
+                self._underutilized_since = now
+            elif now - self._underutilized_since >= SCALE_DOWN_AFTER and num_workers > self.min_pool_size:
+                # Shrink one worker at a time, and only one that isn't doing anything
+                idle_worker = next((w for w in reversed(self._workers) if not w.is_busy()), None)
+                if idle_worker:
+                    self.logger.info(
+                        "Shrinking pool from %s to %s workers (utilization %.0f%%)",
+                        num_workers, num_workers - 1, utilization * 100
+                    )
+                    self._remove_worker(idle_worker)
+                    self._underutilized_since = now
+        else:
+            self._underutilized_since = None
+
     def update_connection(self):
         # Restart the connection
         if self.is_started():
             self.start()
 
-    def enqueue(self, entry: QueuedCommand, priority: int = 10) -> None:
-        self._queue.put_nowait((priority, entry))
+    def enqueue(self, entry: QueuedCommand, priority: int = PRIORITY_DEFAULT) -> None:
+        item = (priority, entry)
+        if self.max_queue_size and self._queue.qsize() >= self.max_queue_size:
+            shed = item
+            if self.shed_policy == "drop_lowest":
+                lowest = self._queue.peek_lowest()
+                if item < lowest:
+                    self._queue.remove(lowest)
+                    self._queue.put_nowait(item)
+                    shed = lowest
+
+            metrics.inc("rcon_pool_shed_total", (self.server,))
+            shed[1].set_exception(HLLQueueFullError("Too many commands are queued"))
+            return
+
+        self._queue.put_nowait(item)
+
+    async def execute(
+        self,
+        command: str,
+        version: int,
+        body: str | dict = "",
+        priority: int | None = None,
+        timeout: float | None = None,
+        deadline: float | None = None,
+    ) -> str:
+        """Queue a command and wait for its response.
+
+        Commands with a lower `priority` are sent first, defaulting to the lane
+        from `COMMAND_PRIORITIES`. Within the same priority, commands with the
+        earliest deadline go first. The `deadline` is in terms of
+        `time.monotonic()`, or is set `timeout` seconds from now. Once it passes,
+        a `TimeoutError` is raised and the command is no longer sent."""
+        # Don't queue up commands for a server that is failing
+        get_circuit_breaker(self.host, self.port).check()
+
+        if priority is None:
+            priority = COMMAND_PRIORITIES.get(command, PRIORITY_DEFAULT)
+        if timeout is not None:
+            deadline = time.monotonic() + timeout if deadline is None else min(deadline, time.monotonic() + timeout)
 
-    async def execute(self, command: str, version: int, body: str | dict = "") -> str:
         entry = QueuedCommand(
             command=command,
             version=version,
             body=body,
             attempts=2,
+            deadline=deadline,
         )
-        self.enqueue(entry)
-        return await entry
+        self.enqueue(entry, priority=priority)
+
+        if self.hedging and command in self.hedge_commands:
+            result = self._execute_hedged(entry, priority)
+        else:
+            result = entry
+
+        if deadline is None:
+            return await result
+        # Cancelling the entry when timing out keeps it from being sent
+        return await asyncio.wait_for(result, timeout=max(deadline - time.monotonic(), 0.0))
+
+    async def _execute_hedged(self, entry: QueuedCommand, priority: int) -> str:
+        key = get_command_name(entry.command, entry.body)
+        started_at = time.monotonic()
+        self._hedge_stats["requests"] += 1
+        self._hedge_tokens = min(self._hedge_tokens + self.hedge_budget, HEDGE_BURST)
+
+        entries = {entry._result: entry}
+        try:
+            delay = self._get_hedge_delay(key)
+            if delay is not None:
+                await asyncio.wait([entry._result], timeout=delay)
+                if not entry.is_done() and self._can_hedge(entry):
+                    hedge = QueuedCommand(
+                        command=entry.command,
+                        version=entry.version,
+                        body=entry.body,
+                        deadline=entry.deadline,
+                    )
+                    hedge.avoid_worker = entry.worker
+                    self._hedge_tokens -= 1
+                    self._hedge_stats["hedges"] += 1
+                    metrics.inc("rcon_pool_hedges_total", (self.server, key))
+                    self.enqueue(hedge, priority=priority)
+                    entries[hedge._result] = hedge
+
+            # Whichever succeeds first wins
+            pending = set(entries)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future.cancelled():
+                        continue
+                    if exc := future.exception():
+                        error = error or exc
+                        continue
+
+                    if entries[future] is not entry:
+                        self._hedge_stats["hedge_wins"] += 1
+                        metrics.inc("rcon_pool_hedge_wins_total", (self.server, key))
+                    self._add_hedge_latency(key, time.monotonic() - started_at)
+                    return future.result()
+
+            if error:
+                raise error
+            # Both were cancelled without the caller being cancelled
+            raise HLLConnectionError("Command was dropped before it could be executed")
+        finally:
+            # Discard the loser
+            for future in entries:
+                future.cancel()
+
+    def _get_hedge_delay(self, key: str) -> float | None:
+        latencies = self._hedge_latencies.get(key)
+        if not latencies or len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+
+        # Sorting is relatively expensive, so only do so every so often
+        num_samples, delay = self._hedge_thresholds.get(key, (0, 0.0))
+        if self._hedge_stats["samples:" + key] - num_samples >= HEDGE_MIN_SAMPLES or not num_samples:
+            values = sorted(latencies)
+            delay = values[min(int(len(values) * self.hedge_percentile), len(values) - 1)]
+            self._hedge_thresholds[key] = (self._hedge_stats["samples:" + key], delay)
+        return delay
+
+    def _add_hedge_latency(self, key: str, latency: float):
+        latencies = self._hedge_latencies.get(key)
+        if latencies is None:
+            latencies = self._hedge_latencies[key] = deque(maxlen=HEDGE_LATENCY_SAMPLES)
+        latencies.append(latency)
+        self._hedge_stats["samples:" + key] += 1
+
+    def _can_hedge(self, entry: QueuedCommand) -> bool:
+        if self._hedge_tokens < 1:
+            return False
+        # Only hedge with spare capacity, otherwise the hedge would only be
+        # waiting in line as well
+        if self._queue.qsize():
+            return False
+        return any(w is not entry.worker and w.has_capacity() for w in self._workers)
+
+    def get_hedge_stats(self) -> dict[str, float]:
+        requests = self._hedge_stats["requests"]
+        hedges = self._hedge_stats["hedges"]
+        wins = self._hedge_stats["hedge_wins"]
+        return {
+            "requests": requests,
+            "hedges": hedges,
+            "hedge_wins": wins,
+            "hedge_rate": hedges / requests if requests else 0.0,
+            "win_rate": wins / hedges if hedges else 0.0,
+        }
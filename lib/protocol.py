@@ -1,14 +1,25 @@
-import array
 import asyncio
 import base64
 from collections import deque
 import logging
+import socket
 import struct
+import time
 from typing import Any, Callable, Self
 
-from lib.constants import DO_POP_V1_XORKEY, DO_WAIT_BETWEEN_REQUESTS, DO_USE_REQUEST_HEADERS, HEADER_FORMAT
+from lib.constants import (
+    DO_POP_V1_XORKEY, DO_USE_REQUEST_HEADERS, FIFO_MAX_ABANDONED, HEADER_FORMAT,
+    REQUEST_TEMPLATE_CACHE_SIZE, TCP_KEEPALIVE_COUNT, TCP_KEEPALIVE_IDLE,
+    TCP_KEEPALIVE_INTERVAL, WRITE_BATCH_MAX_DELAY, WRITE_BATCH_MAX_SIZE,
+)
 from lib.exceptions import HLLConnectionError, HLLConnectionLostError
+from lib.metrics import registry as metrics
 from lib.models import RconRequest, RconResponse
+from lib.tracing import RequestTrace, Tracer
+from lib.utils import DeadlineScheduler
+from lib.xor import XorCodec
+
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
 
 class HLLRconV2Protocol(asyncio.Protocol):
     def __init__(
@@ -17,27 +28,79 @@ class HLLRconV2Protocol(asyncio.Protocol):
         timeout: float | None = None,
         logger: logging.Logger = logging, # type: ignore
         on_connection_lost: Callable[[Exception | None], Any] | None = None,
+        max_in_flight: int = 1,
+        command_timeouts: dict[str, float] | None = None,
+        tracer: Tracer | None = None,
     ):
         self._transport: asyncio.Transport | None = None
-        self._buffer: bytes = b""
+        self._buffer = bytearray()
+        self._abort_exc: Exception | None = None
+
+        # Cleared once the connection stops responding to keepalive probes
+        self.healthy = True
+        self.last_received = time.monotonic()
+
+        self._write_batch: list[bytes] = []
+        self._write_handle: asyncio.Handle | None = None
+        self._can_write = asyncio.Event()
+        self._can_write.set()
 
         if DO_USE_REQUEST_HEADERS:
             self._waiters: dict[int, asyncio.Future[RconResponse]] = {}
         else:
             self._queue: deque[asyncio.Future[RconResponse]] = deque()
+            # Waiters on the queue that no longer wait for their response
+            self._abandoned = 0
         
-        self._lock = asyncio.Lock()
+        # Limits how many requests can await a response at the same time. Without
+        # request headers responses are matched in the order requests were sent.
+        self._in_flight = asyncio.Semaphore(max_in_flight)
         
         if DO_POP_V1_XORKEY:
             self._seen_v1_xorkey: bool = False
 
         self.loop = loop
         self.timeout = timeout
+        self.command_timeouts = command_timeouts or {}
+        self._deadlines = DeadlineScheduler(loop)
         self.logger = logger
         self.on_connection_lost = on_connection_lost
+        self.max_in_flight = max_in_flight
+
+        # The logger may also be the logging module itself, which can't tell us
+        # whether debug messages are enabled
+        self._logger: logging.Logger = logger if isinstance(logger, logging.Logger) else logging.getLogger()
+
+        # Label for metrics, set once connected
+        self.server = "unknown"
+
+        self.tracer = tracer
+        self._traces: dict[asyncio.Future[RconResponse], RequestTrace] = {}
+
+        # Packed and encrypted request bodies, only valid for the current xorkey
+        # and auth token
+        self._templates: dict[tuple, bytes] = {}
 
-        self.xorkey: bytes | None = None
-        self.auth_token: str | None = None
+        self._xor_codec = XorCodec()
+        self._auth_token: str | None = None
+
+    @property
+    def xorkey(self) -> bytes | None:
+        return self._xor_codec.key
+
+    @xorkey.setter
+    def xorkey(self, value: bytes | None) -> None:
+        self._xor_codec.key = value
+        self._templates.clear()
+
+    @property
+    def auth_token(self) -> str | None:
+        return self._auth_token
+
+    @auth_token.setter
+    def auth_token(self, value: str | None) -> None:
+        self._auth_token = value
+        self._templates.clear()
 
     @classmethod
     async def _connect(
@@ -48,6 +111,9 @@ class HLLRconV2Protocol(asyncio.Protocol):
         loop: asyncio.AbstractEventLoop | None = None,
         logger: logging.Logger = logging, # type: ignore
         on_connection_lost: Callable[[Exception | None], Any] | None = None,
+        max_in_flight: int = 1,
+        command_timeouts: dict[str, float] | None = None,
+        tracer: Tracer | None = None,
     ):
         loop = loop or asyncio.get_event_loop()
         protocol_factory = lambda: cls(
@@ -55,6 +121,9 @@ class HLLRconV2Protocol(asyncio.Protocol):
             timeout=timeout,
             logger=logger,
             on_connection_lost=on_connection_lost,
+            max_in_flight=max_in_flight,
+            command_timeouts=command_timeouts,
+            tracer=tracer,
         )
 
         try:
@@ -68,6 +137,7 @@ class HLLRconV2Protocol(asyncio.Protocol):
             raise Exception("The server refused connection over port %s" % port)
 
         logger.info("Connected!")
+        protocol.server = f"{host}:{port}"
         return protocol
 
     @classmethod
@@ -80,6 +150,9 @@ class HLLRconV2Protocol(asyncio.Protocol):
         loop: asyncio.AbstractEventLoop | None = None,
         logger: logging.Logger = logging, # type: ignore
         on_connection_lost: Callable[[Exception | None], Any] | None = None,
+        max_in_flight: int = 1,
+        command_timeouts: dict[str, float] | None = None,
+        tracer: Tracer | None = None,
     ) -> Self:
         protocol = await cls._connect(
             host=host,
@@ -88,6 +161,9 @@ class HLLRconV2Protocol(asyncio.Protocol):
             loop=loop,
             logger=logger,
             on_connection_lost=on_connection_lost,
+            max_in_flight=max_in_flight,
+            command_timeouts=command_timeouts,
+            tracer=tracer,
         )
         await protocol.authenticate(password)
         return protocol
@@ -96,15 +172,78 @@ class HLLRconV2Protocol(asyncio.Protocol):
         if self._transport:
             self._transport.close()
 
+    def abort(self, exc: Exception | None = None):
+        """Drop the connection without waiting for pending writes, failing
+        requests that await a response with `exc`."""
+        if self._transport:
+            self._abort_exc = exc
+            # Don't accept any more requests in the meantime
+            transport, self._transport = self._transport, None
+            transport.abort()
+
     def is_connected(self):
         return self._transport is not None
 
     def connection_made(self, transport):
         self.logger.info('Connection made! Transport: %s', transport)
         self._transport = transport # type: ignore
+        self.last_received = time.monotonic()
+        self._enable_tcp_keepalive(transport)
+
+    def _enable_tcp_keepalive(self, transport: asyncio.BaseTransport):
+        sock: socket.socket | None = transport.get_extra_info("socket")
+        if sock is None:
+            return
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            # Not every platform allows tuning these
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, TCP_KEEPALIVE_IDLE)
+            elif hasattr(socket, "TCP_KEEPALIVE"):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, TCP_KEEPALIVE_IDLE)
+            if hasattr(socket, "TCP_KEEPINTVL"):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, TCP_KEEPALIVE_INTERVAL)
+            if hasattr(socket, "TCP_KEEPCNT"):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, TCP_KEEPALIVE_COUNT)
+        except OSError:
+            self.logger.debug("Failed to enable TCP keepalive", exc_info=True)
+
+    def pause_writing(self):
+        self.logger.debug("Pausing writes, transport buffer is full")
+        self._can_write.clear()
+
+    def resume_writing(self):
+        self.logger.debug("Resuming writes")
+        self._can_write.set()
+
+    def _write(self, message: bytes):
+        # Collect the messages and write them to the transport all at once, instead
+        # of making a separate call for each
+        self._write_batch.append(message)
+        if len(self._write_batch) >= WRITE_BATCH_MAX_SIZE:
+            self._flush()
+        elif not self._write_handle:
+            if WRITE_BATCH_MAX_DELAY > 0:
+                self._write_handle = self.loop.call_later(WRITE_BATCH_MAX_DELAY, self._flush)
+            else:
+                self._write_handle = self.loop.call_soon(self._flush)
+
+    def _flush(self):
+        if self._write_handle:
+            self._write_handle.cancel()
+            self._write_handle = None
+
+        batch = self._write_batch
+        self._write_batch = []
+        if batch and self._transport:
+            if self._logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Flushing %s messages", len(batch))
+            self._transport.writelines(batch)
 
     def data_received(self, data: bytes):
-        self.logger.debug("Incoming: (%s) %s", self._xor(data).count(b"\t"), data[:10])
+        self.last_received = time.monotonic()
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Incoming: (%s) %s", len(data), data[:10])
 
         if DO_POP_V1_XORKEY:
             if not self._seen_v1_xorkey:
@@ -120,46 +259,87 @@ class HLLRconV2Protocol(asyncio.Protocol):
     def _read_from_buffer(self):
         pkt_id: int
         pkt_len: int
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+        traced = bool(self._traces)
+
+        # Decode every complete packet on the buffer in place, and only drop the
+        # consumed bytes from the buffer once we're done
+        buffer = self._buffer
+        buffer_len = len(buffer)
+        offset = 0
+        try:
+            with memoryview(buffer) as view:
+                while buffer_len - offset >= HEADER_SIZE:
+                    # Read header
+                    received_at = time.perf_counter() if traced else 0.0
+                    pkt_id, pkt_len = struct.unpack_from(HEADER_FORMAT, buffer, offset)
+                    pkt_start = offset + HEADER_SIZE
+                    pkt_end = pkt_start + pkt_len
+                    if debug:
+                        self.logger.debug("pkt_id = %s, pkt_len = %s", pkt_id, pkt_len)
+
+                    # Check whether whole packet is on buffer
+                    if pkt_end > buffer_len:
+                        if debug:
+                            self.logger.debug("Buffer too small (%s < %s)", buffer_len - offset, pkt_end - offset)
+                        break
+
+                    # Read packet data from buffer
+                    decoded_body = self._xor(view[pkt_start:pkt_end])
+                    offset = pkt_end
+                    if debug:
+                        self.logger.debug("Unpacking: %s", decoded_body)
+                    parsed_at = time.perf_counter() if traced else 0.0
+                    pkt = RconResponse.unpack(pkt_id, decoded_body)
+                    if traced:
+                        self._handle_response(pkt, received_at, parsed_at, time.perf_counter())
+                    else:
+                        self._handle_response(pkt)
+        finally:
+            if offset:
+                del buffer[:offset]
 
-        # Read header
-        header_len = struct.calcsize(HEADER_FORMAT)
-        if len(self._buffer) < header_len:
-            self.logger.debug("Buffer too small (%s < %s)", len(self._buffer), header_len)
+    def _handle_response(
+        self,
+        pkt: RconResponse,
+        received_at: float = 0.0,
+        parsed_at: float = 0.0,
+        decoded_at: float = 0.0,
+    ):
+        # Respond to waiter
+        if DO_USE_REQUEST_HEADERS:
+            waiter = self._waiters.pop(pkt.id, None)
+            if not waiter:
+                self.logger.warning("No waiter for packet with ID %s", pkt.id)
+                return
+        else:
+            if not self._queue:
+                self.logger.warning("No waiter for packet with ID %s", pkt.id)
+                return
+            waiter = self._queue.popleft()
+            if waiter.done():
+                self._abandoned -= 1
+
+        if waiter.done():
+            # The request timed out or was cancelled; Drop its late response
+            if self._logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Discarding late response for packet with ID %s", pkt.id)
             return
-        # pkt_id, pkt_len = struct.unpack(HEADER_FORMAT, self._xor(self._buffer[:header_len]))
-        pkt_id, pkt_len = struct.unpack(HEADER_FORMAT, self._buffer[:header_len])
-        pkt_size = header_len + pkt_len
-        self.logger.debug("pkt_id = %s, pkt_len = %s", pkt_id, pkt_len)
-
-        # Check whether whole packet is on buffer
-        if len(self._buffer) >= pkt_size:
-            # Read packet data from buffer
-            # decoded_body = self._xor(self._buffer[header_len:pkt_size], offset=header_len)
-            decoded_body = self._xor(self._buffer[header_len:pkt_size])
-            self.logger.debug("Unpacking: %s", decoded_body)
-            pkt = RconResponse.unpack(pkt_id, decoded_body)
-            self._buffer = self._buffer[pkt_size:]
-            
-            # Respond to waiter
-            if DO_USE_REQUEST_HEADERS:
-                waiter = self._waiters.pop(pkt_id, None)
-                if not waiter:
-                    self.logger.warning("No waiter for packet with ID %s", pkt_id)
-                else:
-                    waiter.set_result(pkt)
-            else:
-                if not self._queue:
-                    self.logger.warning("No waiter for packet with ID %s", pkt_id)
-                else:
-                    waiter = self._queue.popleft()
-                    waiter.set_result(pkt)
-            
-            # Repeat if buffer is not empty; Another complete packet might be on it
-            if self._buffer:
-                self._read_from_buffer()
+
+        if received_at and (trace := self._traces.get(waiter)):
+            trace.wait = received_at - trace.sent
+            trace.parse = parsed_at - received_at
+            trace.decode = decoded_at - parsed_at
+        waiter.set_result(pkt)
     
     def connection_lost(self, exc):
         self._transport = None
+        exc = exc or self._abort_exc
+
+        self._flush()
+        self._can_write.set()
+        self._deadlines.clear()
+        self._traces.clear()
 
         if DO_USE_REQUEST_HEADERS:
             waiters = list(self._waiters.values())
@@ -167,6 +347,7 @@ class HLLRconV2Protocol(asyncio.Protocol):
         else:
             waiters = list(self._queue)
             self._queue.clear()
+            self._abandoned = 0
 
         if exc:
             self.logger.warning('Connection lost: %s', exc)
@@ -186,23 +367,50 @@ class HLLRconV2Protocol(asyncio.Protocol):
                 if self.logger:
                     self.logger.exception("Failed to invoke on_connection_lost hook")
 
-    def _xor(self, message: bytes, offset: int = 0) -> bytes:
+    def _xor(self, message: bytes | bytearray | memoryview, offset: int = 0) -> bytes:
         """Encrypt or decrypt a message using the XOR key provided by the game server"""
-        if not self.xorkey:
-            return message
-            
-        n = []
-        for i in range(len(message)):
-            n.append(message[i] ^ self.xorkey[(i + offset) % len(self.xorkey)])
-
-        res = array.array('B', n).tobytes()
-        assert len(res) == len(message)
-        return res
+        return self._xor_codec.apply(message, offset)
     
-    async def execute(self, command: str, version: int, content_body: dict | str = "") -> RconResponse:
+    def _pack(self, request: RconRequest, trace: RequestTrace | None = None) -> bytes:
+        body_offset = HEADER_SIZE if DO_USE_REQUEST_HEADERS else 0
+
+        # Reuse the encrypted body of an identical earlier request if we can
+        key = request.template_key
+        body = self._templates.get(key) if key else None
+        if body is None:
+            if trace:
+                started_at = time.perf_counter()
+                packed = request.pack_body()
+                packed_at = time.perf_counter()
+                trace.pack = packed_at - started_at
+                body = self._xor(packed, offset=body_offset)
+                trace.xor = time.perf_counter() - packed_at
+            else:
+                body = self._xor(request.pack_body(), offset=body_offset)
+
+            if key:
+                if len(self._templates) >= REQUEST_TEMPLATE_CACHE_SIZE:
+                    # Evict the oldest template
+                    del self._templates[next(iter(self._templates))]
+                self._templates[key] = body
+
+        if DO_USE_REQUEST_HEADERS:
+            return self._xor(request.pack_header(len(body))) + body
+        else:
+            return body
+
+    async def execute(
+        self,
+        command: str,
+        version: int,
+        content_body: dict | str = "",
+        timeout: float | None = None,
+    ) -> RconResponse:
         if not self._transport:
             raise HLLConnectionError("Connection is closed")
 
+        debug = self._logger.isEnabledFor(logging.DEBUG)
+
         # Create request
         request = RconRequest(
             command=command,
@@ -211,21 +419,43 @@ class HLLRconV2Protocol(asyncio.Protocol):
             content_body=content_body,
         )
 
-        # Potentially wait before sending request, ensures there is a fixed-length
-        # delay between concurrent requests
-        if DO_WAIT_BETWEEN_REQUESTS > 0:
-            self.logger.debug("Request %s acquiring lock...", request.id)
-            await self._lock.acquire()
-            self.logger.debug("Request %s acquired lock!", request.id)
-            self.loop.call_later(DO_WAIT_BETWEEN_REQUESTS, lambda: self._lock.release())
-        else:
-            await self._lock.acquire()
+        # Wait for a free slot in the in-flight window
+        if debug:
+            self.logger.debug("Request %s acquiring slot...", request.id)
+        await self._in_flight.acquire()
+        if debug:
+            self.logger.debug("Request %s acquired slot!", request.id)
+
+        # Only start tracing once the request gets a slot
+        trace = RequestTrace(request.id, command) if self.tracer is not None else None
 
-        # Send request
-        packed = request.pack()
-        message = self._xor(packed)
-        self.logger.debug("Writing: %s", packed)
-        self._transport.write(message)
+        try:
+            # Apply backpressure while the transport's write buffer is full
+            if not self._can_write.is_set():
+                await self._can_write.wait()
+                if trace:
+                    trace.write = time.perf_counter() - trace.start
+
+            if not self._transport:
+                # We lost connection while waiting
+                raise HLLConnectionError("Connection is closed")
+
+            # Send request
+            message = self._pack(request, trace)
+            if debug:
+                self.logger.debug("Writing: (%s) %s", request.id, request.name)
+            if trace:
+                written_at = time.perf_counter()
+                self._write(message)
+                trace.sent = sent_at = time.perf_counter()
+                trace.write += trace.sent - written_at
+            else:
+                self._write(message)
+                sent_at = time.perf_counter()
+        except BaseException:
+            # Give the slot back if the request is never sent
+            self._in_flight.release()
+            raise
 
         # Create waiter for response
         waiter: asyncio.Future[RconResponse] = self.loop.create_future()
@@ -233,26 +463,62 @@ class HLLRconV2Protocol(asyncio.Protocol):
             self._waiters[request.id] = waiter
         else:
             self._queue.append(waiter)
+        if trace:
+            self._traces[waiter] = trace
+
+        # Have the waiter time out if no response arrives in time
+        if timeout is None:
+            timeout = self.command_timeouts.get(command, self.timeout)
+        if timeout is not None:
+            self._deadlines.add(waiter, timeout)
 
+        status = "ok"
         try:
             # Wait for response
-            response = await asyncio.wait_for(waiter, timeout=self.timeout)
-            self.logger.debug("Response: (%s) %s", response.name, response.content_body)
+            response = await waiter
+            if debug:
+                self.logger.debug("Response: (%s) %s", response.name, response.content_body)
+            metrics.observe("rcon_request_latency_seconds", (self.server, command), time.perf_counter() - sent_at)
             return response
+        except BaseException as e:
+            if trace:
+                trace.error = type(e).__name__
+            if isinstance(e, asyncio.TimeoutError):
+                status = "timeout"
+                if not DO_USE_REQUEST_HEADERS:
+                    # The response may never arrive, after which every response
+                    # would be matched with the wrong request
+                    self.abort(HLLConnectionLostError("Request timed out, responses can no longer be matched"))
+            elif isinstance(e, asyncio.CancelledError):
+                status = "cancelled"
+            else:
+                status = "error"
+            raise
         finally:
-            # Cleanup waiter
-            waiter.cancel()
+            metrics.inc("rcon_requests_total", (self.server, command, status))
+
+            self._deadlines.discard(waiter)
 
+            # Cleanup waiter. Without request headers it has to stay on the queue, so
+            # that a late response is matched with it instead of with the next request.
             if DO_USE_REQUEST_HEADERS:
+                waiter.cancel()
                 self._waiters.pop(request.id, None)
-            else:
-                try:
-                    self._queue.remove(waiter)
-                except ValueError:
-                    pass
-
-            if DO_WAIT_BETWEEN_REQUESTS <= 0:
-                self._lock.release()
+            elif self._transport and (not waiter.done() or waiter.cancelled() or waiter.exception()):
+                # The waiter is still on the queue without having received its response
+                waiter.cancel()
+                self._abandoned += 1
+                if self._abandoned > FIFO_MAX_ABANDONED:
+                    self.abort(HLLConnectionLostError("Too many requests are awaiting a response"))
+
+            if trace and self.tracer is not None:
+                self._traces.pop(waiter, None)
+                trace.end = time.perf_counter()
+                if trace.error:
+                    trace.wait = trace.end - trace.sent
+                self.tracer.record(trace)
+
+            self._in_flight.release()
 
     async def authenticate(self, password: str):
         self.logger.debug('Waiting to login...')
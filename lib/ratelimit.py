@@ -0,0 +1,117 @@
+import asyncio
+import time
+from typing import Mapping
+
+from lib import constants
+from lib.utils import get_command_name
+
+# How much of its rate a limiter gives up when the server drops a connection...
+BACKOFF_FACTOR = 0.5
+# ...without going below this fraction of the configured rate...
+BACKOFF_MIN_FRACTION = 0.1
+# ...and how much of the configured rate it recovers per second afterwards
+RECOVERY_PER_SECOND = 0.05
+
+# The cost of a request in tokens, keyed by the command or, for ServerInformation,
+# the type of information. Defaults to 1.
+COMMAND_WEIGHTS: dict[str, float] = {
+    "players": 4.0,
+    "AdminLog": 2.0,
+    "DisplayableCommands": 2.0,
+}
+
+class TokenBucket:
+    """Holds up to `burst` tokens, refilled at `rate` tokens per second.
+    Callers are served in the order they arrive."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        # A request larger than the bucket would wait forever
+        tokens = min(tokens, self.burst)
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+class RateLimiter:
+    """Limits the rate of requests to a single server. Each request takes
+    tokens from a shared bucket according to its weight.
+
+    When the server drops a connection, which is what it does once it considers
+    itself flooded, the rate is temporarily lowered and then gradually raised
+    back to the configured rate."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float | None = None,
+        weights: Mapping[str, float] = COMMAND_WEIGHTS,
+    ) -> None:
+        self.max_rate = rate
+        self.weights = dict(weights)
+        self.bucket = TokenBucket(rate, rate if burst is None else burst)
+        self._recovered_at = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def get_weight(self, command: str, body: str | dict = "") -> float:
+        return self.weights.get(get_command_name(command, body), 1.0)
+
+    async def acquire(self, command: str, body: str | dict = "") -> None:
+        self._recover()
+        await self.bucket.acquire(self.get_weight(command, body))
+
+    def backoff(self) -> None:
+        self.bucket._refill()
+        self.bucket.rate = max(self.bucket.rate * BACKOFF_FACTOR, self.max_rate * BACKOFF_MIN_FRACTION)
+        self._recovered_at = time.monotonic()
+
+    def _recover(self):
+        now = time.monotonic()
+        if self.bucket.rate < self.max_rate:
+            self.bucket._refill()
+            self.bucket.rate = min(
+                self.max_rate,
+                self.bucket.rate + (now - self._recovered_at) * self.max_rate * RECOVERY_PER_SECOND
+            )
+        self._recovered_at = now
+
+_limiters: dict[str, RateLimiter] = {}
+
+def set_rate_limit(
+    host: str,
+    port: int,
+    rate: float,
+    burst: float | None = None,
+    weights: Mapping[str, float] = COMMAND_WEIGHTS,
+) -> RateLimiter | None:
+    """Limit the requests per second to a server, shared by all connections
+    made to it. A rate of 0 removes the limit."""
+    key = f"{host}:{port}"
+    if rate <= 0:
+        _limiters.pop(key, None)
+        return None
+    limiter = _limiters[key] = RateLimiter(rate, burst=burst, weights=weights)
+    return limiter
+
+def get_rate_limiter(host: str, port: int) -> RateLimiter | None:
+    key = f"{host}:{port}"
+    limiter = _limiters.get(key)
+    if limiter is None and constants.DEFAULT_RATE_LIMIT > 0:
+        limiter = _limiters[key] = RateLimiter(constants.DEFAULT_RATE_LIMIT)
+    return limiter
@@ -1,29 +1,60 @@
 import asyncio
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext
 import logging
-from typing import AsyncIterator
+import time
+from typing import Any, AsyncIterator, Callable
 
+from lib.circuitbreaker import get_circuit_breaker
 from lib.commands import RconCommands
-from lib.exceptions import HLLConnectionError, HLLError
+from lib.exceptions import HLLConnectionError, HLLConnectionLostError, HLLError
+from lib.metrics import registry as metrics
 from lib.abc import RconClient
 from lib.protocol import HLLRconV2Protocol
+from lib.ratelimit import get_rate_limiter
+from lib.tracing import Tracer
 from lib.utils import safe_create_task
 
 BACKOFF_MIN = 0.5
 BACKOFF_MAX = 30.0
 BACKOFF_FACTOR = 1.618
 
+# A reasonable interval to pass as `keepalive_interval`, to probe connections
+# that have not received anything for this many seconds...
+KEEPALIVE_INTERVAL = 15.0
+# ...with a cheap command that should be answered within this many seconds...
+KEEPALIVE_TIMEOUT = 5.0
+# ...and reconnect after this many probes in a row went unanswered
+KEEPALIVE_FAILURES = 2
+KEEPALIVE_COMMAND = ("ServerInformation", 2, {"Name": "session", "Value": ""})
+
 class Rcon(RconClient):
     def __init__(
         self,
         host: str,
         port: int,
         password: str,
-        logger: logging.Logger = logging # type: ignore
+        logger: logging.Logger = logging, # type: ignore
+        *,
+        max_in_flight: int = 1,
+        command_timeouts: dict[str, float] | None = None,
+        tracer: Tracer | None = None,
+        handshake_semaphore: asyncio.Semaphore | None = None,
+        standby_connections: int = 0,
+        keepalive_interval: float | None = None,
     ) -> None:
         self.host = host
         self.port = port
         self.password = password
+        self.max_in_flight = max_in_flight
+        self.command_timeouts = command_timeouts
+        self.tracer = tracer
+        # Optionally shared with other clients, to limit how many of them can be
+        # connecting at the same time
+        self.handshake_semaphore = handshake_semaphore
+        # Authenticated connections to fall back to when the active one is lost
+        self.standby_connections = standby_connections
+        # Without it, dead connections are only noticed once a request times out
+        self.keepalive_interval = keepalive_interval
         self.logger = logger
 
         self.commands = RconCommands(self)
@@ -38,12 +69,20 @@ class Rcon(RconClient):
         self._sock.cancel()
         self._sock_disconnect_event = asyncio.Event()
 
+        self._standby_task: asyncio.Task | None = None
+        self._standbys: list[HLLRconV2Protocol] = []
+        self._standby_event = asyncio.Event()
+        self._keepalive_task: asyncio.Task | None = None
+
     def is_started(self):
         return self._sock_task is not None
 
     def is_connected(self):
         return self._sock.done() and not self._sock.cancelled() and not self._sock.exception()
 
+    def is_healthy(self):
+        return self.is_connected() and self._sock.result().healthy
+
     async def wait_until_connected(self, timeout: float | None = None) -> None:
         try:
             await asyncio.wait_for(asyncio.shield(self._sock), timeout=timeout)
@@ -51,6 +90,13 @@ class Rcon(RconClient):
             raise HLLConnectionError("Connection is closed")
 
     def _handle_connection_loss(self, exc: Exception | None):
+        if self.is_started():
+            metrics.inc("rcon_connection_losses_total", (f"{self.host}:{self.port}",))
+            # Unless we aborted the connection ourselves, the server may have dropped
+            # us for sending too many requests
+            if not isinstance(exc, HLLConnectionLostError):
+                if limiter := get_rate_limiter(self.host, self.port):
+                    limiter.backoff()
         self._sock_disconnect_event.set()
         self._sock_disconnect_event.clear()
 
@@ -66,33 +112,149 @@ class Rcon(RconClient):
         )
         self._sock = asyncio.Future()
 
+        if self.standby_connections > 0:
+            self._standby_task = safe_create_task(
+                self._standby_loop(),
+                err_msg=f"RconClient failed to maintain standby connections",
+                logger=self.logger,
+                name=f"RconClient[{self.host}:{self.port}]-standby"
+            )
+
+        if self.keepalive_interval:
+            self._keepalive_task = safe_create_task(
+                self._keepalive_loop(),
+                err_msg=f"RconClient failed to probe its connections",
+                logger=self.logger,
+                name=f"RconClient[{self.host}:{self.port}]-keepalive"
+            )
+
     def stop(self):
         if self._sock_task:
             self._sock_task.cancel()
             self._sock_task = None
         self._sock.cancel()
 
+        if self._standby_task:
+            self._standby_task.cancel()
+            self._standby_task = None
+        for protocol in self._standbys:
+            protocol.disconnect()
+        self._standbys.clear()
+
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+
     def update_connection(self):
         # Restart the connection
         if self.is_started():
             self.start()
 
+    async def _open(self, on_connection_lost: Callable[[Exception | None], Any], timeout: float = 10):
+        async with self.handshake_semaphore or nullcontext():
+            protocol = await HLLRconV2Protocol._connect(
+                host=self.host,
+                port=self.port,
+                timeout=timeout,
+                logger=self.logger,
+                on_connection_lost=on_connection_lost,
+                max_in_flight=self.max_in_flight,
+                command_timeouts=self.command_timeouts,
+                tracer=self.tracer,
+            )
+
+            try:
+                await protocol.authenticate(self.password)
+            except:
+                protocol.disconnect()
+                raise
+
+        return protocol
+
     @asynccontextmanager
     async def _connect(self, timeout: float = 10):
-        protocol = await HLLRconV2Protocol._connect(
-            host=self.host,
-            port=self.port,
-            timeout=timeout,
-            logger=self.logger,
-            on_connection_lost=self._handle_connection_loss,
-        )
+        # Take over a standby connection if there is one, which takes no round
+        # trips at all
+        protocol = self._pop_standby()
+        if protocol:
+            metrics.inc("rcon_standby_failovers_total", (f"{self.host}:{self.port}",))
+        else:
+            protocol = await self._open(self._handle_connection_loss, timeout=timeout)
 
         try:
-            await protocol.authenticate(self.password)
             yield protocol
         finally:
             protocol.disconnect()
 
+    def _pop_standby(self) -> HLLRconV2Protocol | None:
+        while self._standbys:
+            protocol = self._standbys.pop(0)
+            if protocol.is_connected():
+                protocol.on_connection_lost = self._handle_connection_loss
+                self._standby_event.set()
+                return protocol
+        return None
+
+    def _handle_standby_loss(self, exc: Exception | None):
+        self._standby_event.set()
+
+    async def _standby_loop(self):
+        backoff_delay = BACKOFF_MIN
+        while True:
+            self._standbys = [p for p in self._standbys if p.is_connected()]
+            if len(self._standbys) >= self.standby_connections:
+                self._standby_event.clear()
+                await self._standby_event.wait()
+                continue
+
+            try:
+                protocol = await self._open(self._handle_standby_loss)
+            except Exception:
+                get_circuit_breaker(self.host, self.port).record_failure()
+                self.logger.info("Standby connection failed; retrying in %.1f seconds", backoff_delay)
+                await asyncio.sleep(backoff_delay)
+                backoff_delay = min(backoff_delay * BACKOFF_FACTOR, BACKOFF_MAX)
+                continue
+
+            backoff_delay = BACKOFF_MIN
+            self._standbys.append(protocol)
+
+    async def _keepalive_loop(self):
+        assert self.keepalive_interval
+        while True:
+            await asyncio.sleep(self.keepalive_interval / 2)
+
+            protocols = list(self._standbys)
+            if self.is_connected():
+                protocols.append(self._sock.result())
+
+            now = time.monotonic()
+            await asyncio.gather(*[
+                self._probe(protocol) for protocol in protocols
+                if protocol.is_connected() and now - protocol.last_received >= self.keepalive_interval
+            ], return_exceptions=True)
+
+    async def _probe(self, protocol: HLLRconV2Protocol):
+        command, version, body = KEEPALIVE_COMMAND
+        for _ in range(KEEPALIVE_FAILURES):
+            try:
+                if limiter := get_rate_limiter(self.host, self.port):
+                    await limiter.acquire(command, body)
+                # Any response will do, even an error
+                await protocol.execute(command, version, body, timeout=KEEPALIVE_TIMEOUT)
+                return
+            except HLLConnectionError:
+                return
+            except asyncio.TimeoutError:
+                metrics.inc("rcon_keepalive_failures_total", (f"{self.host}:{self.port}",))
+                # Without request headers the protocol drops the connection itself
+                if not protocol.is_connected():
+                    break
+
+        # Reconnect before any requests run into the same problem
+        self.logger.warning("Connection to %s:%s stopped responding, reconnecting", self.host, self.port)
+        protocol.healthy = False
+        protocol.abort(HLLConnectionLostError("Connection stopped responding to keepalive probes"))
 
     # async with ...
     async def __aenter__(self):
@@ -106,6 +268,9 @@ class Rcon(RconClient):
             password=self.password,
             logger=self.logger,
             on_connection_lost=self._handle_connection_loss,
+            max_in_flight=self.max_in_flight,
+            command_timeouts=self.command_timeouts,
+            tracer=self.tracer,
         )
         try:
             self._sock.set_result(protocol)
@@ -129,8 +294,9 @@ class Rcon(RconClient):
                 async with self._connect() as protocol:
                     yield protocol
             except Exception as e:
-                self.logger.info("Socket connection failed; retrying in %d seconds", int(backoff_delay))
-                await asyncio.sleep(int(backoff_delay))
+                get_circuit_breaker(self.host, self.port).record_failure()
+                self.logger.info("Socket connection failed; retrying in %.1f seconds", backoff_delay)
+                await asyncio.sleep(backoff_delay)
                 # Increase delay with truncated exponential backoff.
                 backoff_delay = backoff_delay * BACKOFF_FACTOR
                 backoff_delay = min(backoff_delay, BACKOFF_MAX)
@@ -147,6 +313,7 @@ class Rcon(RconClient):
                     try:
                         # Once connected change the future to done
                         self._sock.set_result(sock)
+                        metrics.inc("rcon_connects_total", (f"{self.host}:{self.port}",))
                         # Wait until socket disconnects
                         await self._sock_disconnect_event.wait()
                     finally:
@@ -167,9 +334,28 @@ class Rcon(RconClient):
             if e := self._sock.exception():
                 raise e
 
-    async def execute(self, command: str, version: int, body: str | dict = "") -> str:
-        await self.wait_until_connected(timeout=5)
-        protocol = self._sock.result()
-        response = await protocol.execute(command=command, version=version, content_body=body)
+    async def execute(self, command: str, version: int, body: str | dict = "", timeout: float | None = None) -> str:
+        # Fail immediately if the server has been failing
+        breaker = get_circuit_breaker(self.host, self.port)
+        breaker.before_request()
+        try:
+            await self.wait_until_connected(timeout=5)
+            # Shared with every other connection to the same server
+            if limiter := get_rate_limiter(self.host, self.port):
+                await limiter.acquire(command, body)
+                await self.wait_until_connected(timeout=5)
+            if not self.is_connected():
+                # We got disconnected again right away
+                raise HLLConnectionError("Connection is closed")
+            protocol = self._sock.result()
+            response = await protocol.execute(command=command, version=version, content_body=body, timeout=timeout)
+        except (HLLConnectionError, asyncio.TimeoutError):
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.record_cancelled()
+            raise
+        # The server is responding, even if the command failed
+        breaker.record_success()
         response.raise_for_status()
         return response.content_body
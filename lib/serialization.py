@@ -0,0 +1,69 @@
+import json
+from typing import Any, Callable, NamedTuple
+
+class JSONBackend(NamedTuple):
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes | str], Any]
+    decode_errors: tuple[type[Exception], ...]
+
+def _stdlib_backend() -> JSONBackend:
+    return JSONBackend(
+        name="json",
+        dumps=lambda obj: json.dumps(obj).encode(),
+        loads=json.loads,
+        decode_errors=(json.JSONDecodeError,),
+    )
+
+def _orjson_backend() -> JSONBackend:
+    import orjson
+    return JSONBackend(
+        name="orjson",
+        dumps=orjson.dumps,
+        loads=orjson.loads,
+        decode_errors=(orjson.JSONDecodeError,),
+    )
+
+def _msgspec_backend() -> JSONBackend:
+    import msgspec
+    return JSONBackend(
+        name="msgspec",
+        dumps=msgspec.json.Encoder().encode,
+        loads=msgspec.json.Decoder().decode,
+        decode_errors=(msgspec.DecodeError,),
+    )
+
+# In order of preference
+BACKEND_FACTORIES: dict[str, Callable[[], JSONBackend]] = {
+    "orjson": _orjson_backend,
+    "msgspec": _msgspec_backend,
+    "json": _stdlib_backend,
+}
+
+def get_available_backends() -> list[JSONBackend]:
+    backends = []
+    for factory in BACKEND_FACTORIES.values():
+        try:
+            backends.append(factory())
+        except ImportError:
+            pass
+    return backends
+
+def set_json_backend(name: str) -> None:
+    """Change the library used to encode requests and decode responses. Raises
+    an `ImportError` if the library is not installed."""
+    global backend, dumps, loads, JSONDecodeError
+    try:
+        factory = BACKEND_FACTORIES[name]
+    except KeyError:
+        raise ValueError("Unknown JSON backend %r" % name)
+
+    backend = factory()
+    dumps = backend.dumps
+    loads = backend.loads
+    JSONDecodeError = backend.decode_errors
+
+backend: JSONBackend = get_available_backends()[0]
+dumps: Callable[[Any], bytes] = backend.dumps
+loads: Callable[[bytes | str], Any] = backend.loads
+JSONDecodeError: tuple[type[Exception], ...] = backend.decode_errors
@@ -0,0 +1,369 @@
+import asyncio
+import logging
+import multiprocessing
+from multiprocessing.process import BaseProcess
+import os
+import queue
+import time
+from typing import Any, Awaitable, Callable, Iterable, NamedTuple
+
+from lib.fleet import Fleet, FleetServer, ServerConfig
+
+# How often shards report the health of their servers to the coordinator
+HEALTH_INTERVAL = 2.0
+# How often the coordinator checks on its shards
+MONITOR_INTERVAL = 1.0
+# Wait this long before restarting a crashed shard, doubling for each crash in a
+# row up to the maximum
+RESTART_DELAY_MIN = 1.0
+RESTART_DELAY_MAX = 30.0
+# A shard that stayed up this long is no longer considered to be crashing
+RESTART_RESET_AFTER = 60.0
+# Move servers between shards once the number of servers per shard differs by
+# more than this
+REBALANCE_MAX_DIFFERENCE = 1
+
+class ShardResult(NamedTuple):
+    server: str
+    poller: str
+    result: Any
+
+class PollerSpec(NamedTuple):
+    # Must be defined at module level, so that it can be sent to other processes
+    func: Callable[[FleetServer], Awaitable[Any]]
+    interval: float
+    cost: float = 1.0
+    name: str | None = None
+
+class Shard:
+    def __init__(self, id: int) -> None:
+        self.id = id
+        self.servers: dict[str, ServerConfig] = {}
+        self.process: BaseProcess | None = None
+        self.inbox: Any = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.crashes_in_a_row = 0
+        self.restart_at: float | None = None
+        self.health: dict[str, dict] = {}
+        self.cpu_usage = 0.0
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+def _run_shard(
+    shard_id: int,
+    servers: list[ServerConfig],
+    pollers: list[PollerSpec],
+    request_budget: float,
+    inbox: Any,
+    results: Any,
+):
+    logging.basicConfig(
+        level=logging.WARNING,
+        format=f'[%(asctime)s][%(levelname)s][shard {shard_id}] %(message)s',
+    )
+    try:
+        asyncio.run(_shard_loop(shard_id, servers, pollers, request_budget, inbox, results))
+    except KeyboardInterrupt:
+        pass
+
+async def _shard_loop(
+    shard_id: int,
+    servers: list[ServerConfig],
+    pollers: list[PollerSpec],
+    request_budget: float,
+    inbox: Any,
+    results: Any,
+):
+    loop = asyncio.get_running_loop()
+    fleet = Fleet(servers, request_budget=request_budget)
+
+    def wrap(spec: PollerSpec):
+        name = spec.name or spec.func.__name__
+        async def poll(server: FleetServer):
+            result = await spec.func(server)
+            if result is not None:
+                results.put(("result", shard_id, ShardResult(server.name, name, result)))
+        return poll
+
+    for spec in pollers:
+        fleet.add_poller(wrap(spec), interval=spec.interval, cost=spec.cost, name=spec.name or spec.func.__name__)
+    fleet.start()
+
+    async def report_health():
+        cpu_time = time.process_time()
+        wall_time = time.monotonic()
+        while True:
+            await asyncio.sleep(HEALTH_INTERVAL)
+            now_cpu, now_wall = time.process_time(), time.monotonic()
+            cpu_usage = (now_cpu - cpu_time) / (now_wall - wall_time)
+            cpu_time, wall_time = now_cpu, now_wall
+            results.put(("health", shard_id, (fleet.get_health(), cpu_usage)))
+
+    health_task = asyncio.create_task(report_health())
+    try:
+        while True:
+            # The queue blocks, so wait for it in a thread
+            command, arg = await loop.run_in_executor(None, inbox.get)
+            if command == "add":
+                fleet.add_server(arg)
+            elif command == "remove":
+                if arg in fleet.servers:
+                    fleet.remove_server(arg)
+            elif command == "budget":
+                fleet.set_request_budget(arg)
+            elif command == "stop":
+                break
+    finally:
+        health_task.cancel()
+        await fleet.stop()
+
+class ShardedFleet:
+    """Spreads servers over multiple processes, each running its own `Fleet`,
+    so that decoding responses isn't limited to a single CPU core.
+
+    Pollers run inside the shards, and whatever they return is sent back to the
+    coordinator and passed to `on_result`. Keep results small, since they have
+    to be pickled. Shards that crash are restarted with the same servers, and
+    servers are moved between shards when they become uneven.
+
+    ```py
+    async def poll_player_count(server: FleetServer):
+        session = await server.commands.get_server_session()
+        return session["playerCount"]
+
+    fleet = ShardedFleet(servers, [PollerSpec(poll_player_count, interval=5)], on_result=print)
+    fleet.start()
+    ...
+    await fleet.stop()
+    ```
+    """
+
+    def __init__(
+        self,
+        servers: Iterable[ServerConfig],
+        pollers: Iterable[PollerSpec],
+        num_shards: int | None = None,
+        request_budget: float = 200.0,
+        on_result: Callable[[ShardResult], Any] | None = None,
+        logger: logging.Logger = logging # type: ignore
+    ) -> None:
+        self.pollers = list(pollers)
+        self.num_shards = num_shards or os.cpu_count() or 1
+        self.request_budget = request_budget
+        self.on_result = on_result
+        self.logger = logger
+
+        # Forking a process that is running an event loop is asking for trouble
+        self._context = multiprocessing.get_context("spawn")
+        self._results: Any = None
+        self._shards = [Shard(i) for i in range(self.num_shards)]
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = False
+
+        for i, server in enumerate(servers):
+            self._shards[i % self.num_shards].servers[server.name] = server
+
+    @property
+    def servers(self) -> dict[str, ServerConfig]:
+        return {name: server for shard in self._shards for name, server in shard.servers.items()}
+
+    def is_started(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        if self.is_started():
+            raise RuntimeError("ShardedFleet is already started")
+
+        self._stopping = False
+        self._results = self._context.Queue()
+        for shard in self._shards:
+            self._start_shard(shard)
+
+        self._tasks = [
+            asyncio.create_task(self._read_results()),
+            asyncio.create_task(self._monitor_loop()),
+        ]
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+        for shard in self._shards:
+            if shard.is_alive():
+                shard.inbox.put(("stop", None))
+
+        # Joining blocks, so wait for all shards at once in threads
+        loop = asyncio.get_running_loop()
+        processes = [shard.process for shard in self._shards if shard.process]
+        await asyncio.gather(*[loop.run_in_executor(None, process.join, 5) for process in processes])
+        for shard in self._shards:
+            if shard.process:
+                if shard.process.is_alive():
+                    shard.process.terminate()
+                shard.process = None
+
+    def add_server(self, server: ServerConfig) -> None:
+        if server.name in self.servers:
+            raise ValueError("Duplicate server name %r" % server.name)
+        shard = min(self._shards, key=lambda shard: len(shard.servers))
+        self._assign(shard, server)
+        self._update_budgets()
+
+    def remove_server(self, name: str) -> None:
+        for shard in self._shards:
+            if name in shard.servers:
+                del shard.servers[name]
+                shard.health.pop(name, None)
+                if shard.is_alive():
+                    shard.inbox.put(("remove", name))
+        self._update_budgets()
+
+    def get_health(self) -> dict[str, dict]:
+        """The latest reported health of each server, along with the shard it
+        is on. Servers on a shard that is down are reported as such."""
+        health = {}
+        for shard in self._shards:
+            for name in shard.servers:
+                if shard.is_alive() and name in shard.health:
+                    health[name] = {**shard.health[name], "shard": shard.id}
+                else:
+                    health[name] = {"status": "shard_down" if not shard.is_alive() else "starting", "shard": shard.id}
+        return health
+
+    def get_shard_stats(self) -> list[dict]:
+        return [
+            {
+                "id": shard.id,
+                "alive": shard.is_alive(),
+                "servers": len(shard.servers),
+                "restarts": shard.restarts,
+                "cpu_usage": shard.cpu_usage,
+            }
+            for shard in self._shards
+        ]
+
+    def _get_budget(self, shard: Shard) -> float:
+        # Split the budget according to the number of servers
+        num_servers = sum(len(s.servers) for s in self._shards)
+        if not num_servers:
+            return self.request_budget / self.num_shards
+        return max(self.request_budget * len(shard.servers) / num_servers, 1.0)
+
+    def _update_budgets(self):
+        for shard in self._shards:
+            if shard.is_alive():
+                shard.inbox.put(("budget", self._get_budget(shard)))
+
+    def _start_shard(self, shard: Shard):
+        shard.inbox = self._context.Queue()
+        shard.health = {}
+        shard.process = self._context.Process(
+            target=_run_shard,
+            args=(
+                shard.id,
+                list(shard.servers.values()),
+                self.pollers,
+                self._get_budget(shard),
+                shard.inbox,
+                self._results,
+            ),
+            name=f"RconShard-{shard.id}",
+            daemon=True,
+        )
+        shard.process.start()
+        shard.started_at = time.monotonic()
+        shard.restart_at = None
+
+    def _assign(self, shard: Shard, server: ServerConfig):
+        shard.servers[server.name] = server
+        if shard.is_alive():
+            shard.inbox.put(("add", server))
+
+    async def _read_results(self):
+        loop = asyncio.get_running_loop()
+        results = self._results
+
+        def get_batch():
+            # Block for the first item only, then take whatever else is ready
+            try:
+                batch = [results.get(timeout=0.5)]
+            except queue.Empty:
+                return []
+            while len(batch) < 1000:
+                try:
+                    batch.append(results.get_nowait())
+                except queue.Empty:
+                    break
+            return batch
+
+        while True:
+            for kind, shard_id, payload in await loop.run_in_executor(None, get_batch):
+                shard = self._shards[shard_id]
+                if kind == "health":
+                    shard.health, shard.cpu_usage = payload
+                elif kind == "result" and self.on_result:
+                    try:
+                        self.on_result(payload)
+                    except Exception:
+                        self.logger.exception("Failed to handle result of shard %s", shard_id)
+
+    async def _monitor_loop(self):
+        while True:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            try:
+                self._monitor()
+            except Exception:
+                self.logger.exception("Failed to monitor shards")
+
+    def _monitor(self):
+        if self._stopping:
+            return
+
+        now = time.monotonic()
+        for shard in self._shards:
+            if shard.is_alive():
+                if shard.crashes_in_a_row and now - shard.started_at > RESTART_RESET_AFTER:
+                    shard.crashes_in_a_row = 0
+                continue
+
+            if shard.restart_at is None:
+                assert shard.process is not None
+                delay = min(RESTART_DELAY_MIN * 2 ** shard.crashes_in_a_row, RESTART_DELAY_MAX)
+                self.logger.warning(
+                    "Shard %s with %s servers exited with code %s, restarting in %.0f seconds",
+                    shard.id, len(shard.servers), shard.process.exitcode, delay
+                )
+                shard.crashes_in_a_row += 1
+                shard.restart_at = now + delay
+            elif now >= shard.restart_at:
+                shard.restarts += 1
+                self._start_shard(shard)
+
+        self._rebalance()
+
+    def _rebalance(self):
+        # Only move servers between shards that are up
+        shards = [shard for shard in self._shards if shard.is_alive()]
+        if len(shards) < 2:
+            return
+
+        moved = 0
+        while True:
+            largest = max(shards, key=lambda shard: len(shard.servers))
+            smallest = min(shards, key=lambda shard: len(shard.servers))
+            if len(largest.servers) - len(smallest.servers) <= REBALANCE_MAX_DIFFERENCE:
+                break
+
+            name, server = largest.servers.popitem()
+            largest.health.pop(name, None)
+            largest.inbox.put(("remove", name))
+            self._assign(smallest, server)
+            moved += 1
+
+        if moved:
+            self.logger.info("Moved %s servers between shards", moved)
+            self._update_budgets()
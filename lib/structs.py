@@ -0,0 +1,300 @@
+from typing import Any, Callable, Generic, Self, TypeVar
+
+from lib import serialization
+from lib.responses import PlayerPlatform, PlayerRole, PlayerTeam, SupportedPlatform
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+T = TypeVar('T')
+
+# Enum members by value, which is quicker than calling the enum. Values the
+# server adds later are kept as they are.
+_PLATFORMS: dict[Any, PlayerPlatform] = {member.value: member for member in PlayerPlatform}
+_SUPPORTED_PLATFORMS: dict[Any, SupportedPlatform] = {member.value: member for member in SupportedPlatform}
+_TEAMS: dict[Any, PlayerTeam] = {member.value: member for member in PlayerTeam}
+_ROLES: dict[Any, PlayerRole] = {member.value: member for member in PlayerRole}
+
+if msgspec is not None:
+    class Struct(msgspec.Struct, gc=False):
+        """A compact alternative to the dicts from `lib/responses.py`, with regular
+        field names and enums already decoded."""
+
+        def to_dict(self) -> dict:
+            return {name: _to_dict(getattr(self, name)) for name in self.__struct_fields__}
+
+else:
+    class _StructMeta(type):
+        # Gives structs slots and positional fields based on their annotations,
+        # like `msgspec.Struct` does
+        def __new__(mcls, name: str, bases: tuple, namespace: dict, **kwargs: Any):
+            fields = tuple(namespace.get("__annotations__", ()))
+            namespace["__slots__"] = fields
+            namespace["__struct_fields__"] = fields
+            return super().__new__(mcls, name, bases, namespace)
+
+    class Struct(metaclass=_StructMeta): # type: ignore
+        """A compact alternative to the dicts from `lib/responses.py`, with regular
+        field names and enums already decoded."""
+
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            for name, value in zip(self.__struct_fields__, args):
+                setattr(self, name, value)
+            for name, value in kwargs.items():
+                setattr(self, name, value)
+            self.__post_init__()
+
+        def __post_init__(self) -> None:
+            pass
+
+        def to_dict(self) -> dict:
+            return {name: _to_dict(getattr(self, name)) for name in self.__struct_fields__}
+
+        def __eq__(self, other: object) -> bool:
+            if type(other) is not type(self):
+                return NotImplemented
+            return all(getattr(self, name) == getattr(other, name) for name in self.__struct_fields__)
+
+        def __repr__(self) -> str:
+            fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__struct_fields__)
+            return f"{type(self).__name__}({fields})"
+
+def _to_dict(value: Any) -> Any:
+    if isinstance(value, Struct):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_to_dict(item) for item in value]
+    return value
+
+
+# The `rename` mappings are only used by msgspec, which decodes responses
+# straight into these. With other JSON backends `from_dict` is used instead.
+class AdminLogEntry(Struct):
+    timestamp: str
+    message: str
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        return cls(data["timestamp"], data["message"])
+
+class CommandEntry(Struct, rename={"id": "iD", "friendly_name": "friendlyName", "is_client_supported": "isClientSupported"}):
+    id: str
+    friendly_name: str
+    is_client_supported: bool
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        return cls(data["iD"], data["friendlyName"], data["isClientSupported"])
+
+
+class ScoreData(Struct, rename={"combat": "cOMBAT"}):
+    combat: int
+    offense: int
+    defense: int
+    support: int
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        return cls(data["cOMBAT"], data["offense"], data["defense"], data["support"])
+
+class WorldPosition(Struct):
+    """A position in centimeters. `x` is the east-west axis and `y` the
+    north-south axis, both between -100000 and 100000. `z` is the vertical axis."""
+
+    x: float
+    y: float
+    z: float
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        return cls(data["x"], data["y"], data["z"])
+
+class Player(Struct, rename={"clan_tag": "clanTag", "id": "iD", "eos_id": "eOSId", "score": "scoreData", "position": "worldPosition"}):
+    """`platform`, `team` and `role` are decoded into a `PlayerPlatform`,
+    `PlayerTeam` and `PlayerRole` respectively."""
+
+    name: str
+    clan_tag: str
+    id: str
+    platform: str
+    eos_id: str
+    level: int
+    team: int
+    role: int
+    platoon: str
+    loadout: str
+    kills: int
+    deaths: int
+    score: ScoreData
+    position: WorldPosition
+
+    def __post_init__(self) -> None:
+        self.platform = _PLATFORMS.get(self.platform, self.platform)
+        self.team = _TEAMS.get(self.team, self.team)
+        self.role = _ROLES.get(self.role, self.role)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        return cls(
+            data["name"],
+            data["clanTag"],
+            data["iD"],
+            data["platform"],
+            data["eOSId"],
+            data["level"],
+            data["team"],
+            data["role"],
+            data["platoon"],
+            data["loadout"],
+            data["kills"],
+            data["deaths"],
+            ScoreData.from_dict(data["scoreData"]),
+            WorldPosition.from_dict(data["worldPosition"]),
+        )
+
+
+class MapRotationEntry(Struct, rename={"game_mode": "gameMode", "time_of_day": "timeOfDay", "id": "iD"}):
+    name: str
+    game_mode: str
+    time_of_day: str
+    id: str
+    position: int
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        return cls(data["name"], data["gameMode"], data["timeOfDay"], data["iD"], data["position"])
+
+
+class ServerSession(Struct, rename={
+    "server_name": "serverName", "map_name": "mapName", "game_mode": "gameMode",
+    "player_count": "playerCount", "queue_count": "queueCount", "max_queue_count": "maxQueueCount",
+    "vip_queue_count": "vIPQueueCount", "max_vip_queue_count": "maxVIPQueueCount",
+}):
+    server_name: str
+    map_name: str
+    game_mode: str
+    player_count: int
+    queue_count: int
+    max_queue_count: int
+    vip_queue_count: int
+    max_vip_queue_count: int
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        return cls(
+            data["serverName"],
+            data["mapName"],
+            data["gameMode"],
+            data["playerCount"],
+            data["queueCount"],
+            data["maxQueueCount"],
+            data["vIPQueueCount"],
+            data["maxVIPQueueCount"],
+        )
+
+class ServerConfig(Struct, rename={
+    "server_name": "serverName", "build_number": "buildNumber",
+    "build_revision": "buildRevision", "supported_platforms": "supportedPlatforms",
+}):
+    """`supported_platforms` is decoded into a list of `SupportedPlatform`."""
+
+    server_name: str
+    build_number: str
+    build_revision: str
+    supported_platforms: list[str]
+
+    def __post_init__(self) -> None:
+        self.supported_platforms = [
+            _SUPPORTED_PLATFORMS.get(platform, platform) for platform in self.supported_platforms
+        ]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        return cls(data["serverName"], data["buildNumber"], data["buildRevision"], data["supportedPlatforms"])
+
+
+class CommandParameter(Struct, rename={"id": "iD", "display_member": "displayMember", "value_member": "valueMember"}):
+    """`display_member` and `value_member` are comma-separated lists of values
+    when `type` is "Combo", and empty otherwise."""
+
+    type: str
+    name: str
+    id: str
+    display_member: str
+    value_member: str
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        return cls(data["type"], data["name"], data["iD"], data["displayMember"], data["valueMember"])
+
+class CommandDetails(Struct, rename={"parameters": "dialogueParameters"}):
+    name: str
+    text: str
+    description: str
+    parameters: list[CommandParameter]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        return cls(
+            data["name"],
+            data["text"],
+            data["description"],
+            [CommandParameter.from_dict(parameter) for parameter in data["dialogueParameters"]],
+        )
+
+
+# Decoders for the content body of each response, unwrapping the lists
+def decode_admin_log(data: dict) -> list[AdminLogEntry]:
+    return [AdminLogEntry.from_dict(entry) for entry in data["entries"]]
+
+def decode_all_commands(data: dict) -> list[CommandEntry]:
+    return [CommandEntry.from_dict(entry) for entry in data["entries"]]
+
+def decode_players(data: dict) -> list[Player]:
+    from_dict = Player.from_dict
+    return [from_dict(player) for player in data["players"]]
+
+def decode_map_rotation(data: dict) -> list[MapRotationEntry]:
+    return [MapRotationEntry.from_dict(entry) for entry in data["mAPS"]]
+
+# The responses wrapping the lists, for msgspec
+class _AdminLogResponse(Struct):
+    entries: list[AdminLogEntry]
+
+class _AllCommandsResponse(Struct):
+    entries: list[CommandEntry]
+
+class _PlayersResponse(Struct):
+    players: list[Player]
+
+class _MapRotationResponse(Struct, rename={"maps": "mAPS"}):
+    maps: list[MapRotationEntry]
+
+
+class ResponseDecoder(Generic[T]):
+    """Decodes a content body into structs. With msgspec as the JSON backend it
+    is decoded straight into `type`, otherwise it is decoded into dicts first
+    and then passed to `from_dict`. `field` is the attribute of `type` to
+    return, for responses that wrap a list."""
+
+    def __init__(self, type: Any, from_dict: Callable[[Any], T], field: str | None = None) -> None:
+        self.from_dict = from_dict
+        self.field = field
+        self._decoder = msgspec.json.Decoder(type) if msgspec is not None else None
+
+    def decode(self, body: str | bytes) -> T:
+        if self._decoder is not None and serialization.backend.name == "msgspec":
+            result = self._decoder.decode(body)
+            return getattr(result, self.field) if self.field else result
+        return self.from_dict(serialization.loads(body))
+
+ADMIN_LOG_DECODER = ResponseDecoder(_AdminLogResponse, decode_admin_log, "entries")
+ALL_COMMANDS_DECODER = ResponseDecoder(_AllCommandsResponse, decode_all_commands, "entries")
+PLAYER_DECODER = ResponseDecoder(Player, Player.from_dict)
+PLAYERS_DECODER = ResponseDecoder(_PlayersResponse, decode_players, "players")
+MAP_ROTATION_DECODER = ResponseDecoder(_MapRotationResponse, decode_map_rotation, "maps")
+SERVER_SESSION_DECODER = ResponseDecoder(ServerSession, ServerSession.from_dict)
+SERVER_CONFIG_DECODER = ResponseDecoder(ServerConfig, ServerConfig.from_dict)
+COMMAND_DETAILS_DECODER = ResponseDecoder(CommandDetails, CommandDetails.from_dict)
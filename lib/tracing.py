@@ -0,0 +1,82 @@
+from collections import deque
+import json
+from pathlib import Path
+import time
+
+STAGES = ("pack", "xor", "write", "wait", "parse", "decode")
+
+class RequestTrace:
+    """Timings of a single request, in seconds, for each stage of its round trip."""
+
+    __slots__ = ("request_id", "command", "start", "sent", "end", "error", *STAGES)
+
+    def __init__(self, request_id: int, command: str) -> None:
+        self.request_id = request_id
+        self.command = command
+        self.start = time.perf_counter()
+        self.sent = 0.0
+        self.end = 0.0
+        self.error: str | None = None
+        self.pack = 0.0
+        self.xor = 0.0
+        self.write = 0.0
+        self.wait = 0.0
+        self.parse = 0.0
+        self.decode = 0.0
+
+    @property
+    def total(self) -> float:
+        return self.end - self.start
+
+    def to_dict(self) -> dict:
+        return {
+            "request_id": self.request_id,
+            "command": self.command,
+            "start": self.start,
+            "total": self.total,
+            "error": self.error,
+            **{stage: getattr(self, stage) for stage in STAGES},
+        }
+
+class Tracer:
+    """Keeps the traces of the most recent requests in a ring buffer.
+
+    Pass one to `HLLRconV2Protocol` or `Rcon` to start tracing. Without a tracer,
+    none of the timings are measured."""
+
+    def __init__(self, maxlen: int = 10_000) -> None:
+        self.traces: deque[RequestTrace] = deque(maxlen=maxlen)
+
+    def __len__(self) -> int:
+        return len(self.traces)
+
+    def record(self, trace: RequestTrace) -> None:
+        self.traces.append(trace)
+
+    def clear(self) -> None:
+        self.traces.clear()
+
+    def dump(self) -> list[dict]:
+        return [trace.to_dict() for trace in self.traces]
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """The mean, median and 99th percentile of each stage, in milliseconds."""
+        traces = list(self.traces)
+        summary = {}
+        if not traces:
+            return summary
+
+        for stage in (*STAGES, "total"):
+            values = sorted(getattr(trace, stage) for trace in traces)
+            summary[stage] = {
+                "mean": sum(values) / len(values) * 1000,
+                "p50": values[len(values) // 2] * 1000,
+                "p99": values[min(len(values) - 1, int(len(values) * 0.99))] * 1000,
+            }
+        return summary
+
+    def export_json(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps({
+            "summary": self.summary(),
+            "traces": self.dump(),
+        }, indent=2))
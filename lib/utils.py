@@ -1,4 +1,6 @@
 import asyncio
+import heapq
+import itertools
 import logging
 from typing import Coroutine
 
@@ -19,3 +21,74 @@ def safe_create_task(
     task = asyncio.create_task(coro, name=name)
     task.add_done_callback(_task_inner)
     return task
+
+def get_command_name(command: str, body: str | dict) -> str:
+    """The name of a command, with the various kinds of `ServerInformation`
+    requests told apart."""
+    if command == "ServerInformation" and isinstance(body, dict):
+        return body.get("Name", command)
+    return command
+
+class DeadlineScheduler:
+    """Expires futures that are still pending past their deadline, using a
+    single timer for all of them."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, resolution: float = 0.05) -> None:
+        self.loop = loop
+        self.resolution = resolution
+        # [deadline, counter, future], where the future is None once discarded
+        self._deadlines: list[list] = []
+        self._entries: dict[asyncio.Future, list] = {}
+        self._counter = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, future: asyncio.Future, timeout: float) -> None:
+        deadline = self.loop.time() + timeout
+        entry = [deadline, next(self._counter), future]
+        self._entries[future] = entry
+        heapq.heappush(self._deadlines, entry)
+        if self._deadlines[0] is entry:
+            self._schedule()
+
+    def discard(self, future: asyncio.Future) -> None:
+        """Stop tracking a future, for instance because it completed."""
+        entry = self._entries.pop(future, None)
+        if entry is None:
+            return
+        entry[2] = None
+        # Rebuild the heap once it mostly consists of discarded entries
+        if len(self._deadlines) > 2 * len(self._entries) + 16:
+            self._deadlines = [entry for entry in self._deadlines if entry[2] is not None]
+            heapq.heapify(self._deadlines)
+
+    def clear(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self._deadlines.clear()
+        self._entries.clear()
+
+    def _schedule(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._deadlines:
+            # Round up, so that futures with nearly the same deadline expire together
+            when = self._deadlines[0][0]
+            when += self.resolution - (when % self.resolution)
+            self._timer = self.loop.call_at(when, self._expire)
+
+    def _expire(self) -> None:
+        self._timer = None
+        now = self.loop.time()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, future = heapq.heappop(self._deadlines)
+            if future is None:
+                continue
+            del self._entries[future]
+            if not future.done():
+                future.set_exception(asyncio.TimeoutError())
+        self._schedule()
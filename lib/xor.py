@@ -0,0 +1,41 @@
+class XorCodec:
+    """Encrypts or decrypts whole buffers using the XOR key provided by the game server"""
+
+    def __init__(self, key: bytes | None = None) -> None:
+        self._key = b""
+        self._stream = b""
+        self.key = key
+
+    @property
+    def key(self) -> bytes | None:
+        return self._key or None
+
+    @key.setter
+    def key(self, value: bytes | None) -> None:
+        self._key = bytes(value or b"")
+        self._stream = self._key
+
+    def _keystream(self, size: int, offset: int = 0) -> bytes:
+        # The key is tiled once and then reused for every message. It only grows
+        # when a message larger than any message before it comes along.
+        start = offset % len(self._key)
+        end = start + size
+        if len(self._stream) < end:
+            repeats = -(-end // len(self._key))
+            self._stream = self._key * max(repeats, 2 * len(self._stream) // len(self._key))
+        return self._stream[start:end]
+
+    def apply(self, data: bytes | bytearray | memoryview, offset: int = 0) -> bytes:
+        """XOR `data` with the key, where `offset` is the position of `data`'s
+        first byte within the message it was taken from."""
+        if not self._key:
+            return bytes(data)
+
+        size = len(data)
+        if not size:
+            return b""
+
+        # XOR the whole buffer at once as one big integer instead of byte by byte
+        stream = self._keystream(size, offset)
+        res = int.from_bytes(data, "little") ^ int.from_bytes(stream, "little")
+        return res.to_bytes(size, "little")